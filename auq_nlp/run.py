@@ -23,7 +23,7 @@ sys.path.insert(0, str(Path(__file__).parent / "src"))
 try:
     import uvicorn
     from src.auq_nlp.api.main import app
-    from src.auq_nlp.core.config import settings
+    from src.auq_nlp.core.config import get_settings
     from src.auq_nlp.utils.logging import setup_logging, success, error
 except ImportError as e:
     print(f"❌ Failed to import required modules: {e}")
@@ -33,6 +33,8 @@ except ImportError as e:
 
 def parse_arguments():
     """Parse command line arguments"""
+    settings = get_settings()
+    
     parser = argparse.ArgumentParser(
         description="AUQ NLP API Server",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -83,8 +85,8 @@ Examples:
     parser.add_argument(
         "--workers",
         type=int,
-        default=1,
-        help="Number of worker processes (default: 1)"
+        default=settings.workers,
+        help=f"Number of worker processes, ignored with --reload (default: {settings.workers})"
     )
     
     return parser.parse_args()
@@ -92,6 +94,8 @@ Examples:
 
 def validate_environment():
     """Validate environment variables and configuration"""
+    settings = get_settings()
+    
     try:
         # Test if we can access the required settings
         _ = settings.supabase_uri
@@ -109,6 +113,8 @@ def validate_environment():
 
 def print_startup_banner():
     """Print startup banner with system information"""
+    settings = get_settings()
+    
     banner = f"""
 🌟 ═══════════════════════════════════════════════════════════════
     AUQ NLP API - Are U Query-ous Natural Language Processing
@@ -124,6 +130,7 @@ def print_startup_banner():
 🌐 Server Configuration:
    • Host: {settings.host}
    • Port: {settings.port}
+   • Workers: {settings.workers}
    • Log Level: {settings.log_level}
 
 🚀 Starting server...
@@ -147,7 +154,15 @@ def main():
     
     # Update settings with command line arguments
     if args.debug:
-        settings.debug = True
+        get_settings().debug = True
+        # Worker processes build their settings from the environment
+        os.environ["DEBUG"] = "true"
+    
+    # Worker processes read WORKERS to size their database pools
+    os.environ["WORKERS"] = str(args.workers if not args.reload else 1)
+    
+    # uvloop is POSIX-only, fall back to the default asyncio loop on Windows
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
     
     try:
         # Start the server
@@ -158,6 +173,9 @@ def main():
             reload=args.reload,
             log_level=args.log_level.lower(),
             workers=args.workers if not args.reload else 1,
+            loop=loop,
+            http="httptools",
+            proxy_headers=False,
             access_log=args.debug,
             server_header=False,
             date_header=False
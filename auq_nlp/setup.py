@@ -59,7 +59,7 @@ setup(
             "pytest>=7.0.0",
             "pytest-asyncio>=0.21.0",
             "pytest-cov>=4.0.0",
-            "httpx>=0.24.0",
+            "httpx[http2]>=0.24.0",
         ],
     },
     
@@ -14,13 +14,27 @@ __version__ = "2.0.0"
 __author__ = "Nicolas Dalessandro"
 __email__ = "nicodalessandro11@gmail.com"
 
-# Import core components for easy access
-from .core.config import settings
-from .core.cache import QueryCache
-from .core.validator import ResultValidator
+import importlib
+
+# Core components for easy access, imported on first use (PEP 562)
+_LAZY_IMPORTS = {
+    "settings": ".core.config",
+    "get_settings": ".core.config",
+    "QueryCache": ".core.cache",
+    "ResultValidator": ".core.validator",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "settings",
+    "get_settings",
     "QueryCache", 
     "ResultValidator",
 ] 
\ No newline at end of file
@@ -7,8 +7,10 @@ processing components.
 
 from .langchain_agent import LangChainAgent
 from .query_processor import QueryProcessor
+from .session_memory import SessionMemory
 
 __all__ = [
     "LangChainAgent",
     "QueryProcessor",
+    "SessionMemory",
 ] 
\ No newline at end of file
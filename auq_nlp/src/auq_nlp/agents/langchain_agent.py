@@ -2,29 +2,48 @@
 LangChain Agent for AUQ NLP
 
 Manages the LangChain SQL agent initialization, configuration, and query processing.
+
+LangChain and OpenAI are imported when the agent is initialized rather than
+at module import, so the API can start serving before they are loaded.
 """
 
+import asyncio
 import os
+import time
 import warnings
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from langchain_community.utilities import SQLDatabase
-from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-from langchain_community.agent_toolkits.sql.base import create_sql_agent
-from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_core._api.deprecation import LangChainDeprecationWarning
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
-from ..core.config import settings
-from ..utils.logging import get_logger, info, success, warning, error
+from ..core.config import get_settings
+from ..utils.logging import get_logger, debug, info, success, warning, error
+from ..utils.metrics import metrics_enabled
 
-# Ignore LangChain internal deprecation warnings
-warnings.filterwarnings("ignore", category=LangChainDeprecationWarning)
+if TYPE_CHECKING:
+    from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+    from langchain_community.callbacks.openai_info import OpenAICallbackHandler
+    from langchain_openai import ChatOpenAI
+    
+    from .langchain_extensions import CachedSQLDatabase
 
 logger = get_logger(__name__)
 
 
+@lru_cache(maxsize=None)
+def _read_prompt_file(prompt_path: Path) -> str:
+    """Read a prompt file once per process, agents re-created later reuse it"""
+    return prompt_path.read_text(encoding="utf-8")
+
+
 class LangChainAgent:
     """
     LangChain SQL Agent wrapper for urban data analysis
@@ -34,11 +53,16 @@ class LangChainAgent:
     """
     
     def __init__(self):
-        self.llm: Optional[ChatOpenAI] = None
-        self.db: Optional[SQLDatabase] = None
+        self.llm: Optional["ChatOpenAI"] = None
+        self.sql_llm: Optional["ChatOpenAI"] = None
+        self.engine: Optional[Engine] = None
+        self.db: Optional["CachedSQLDatabase"] = None
         self.agent = None
-        self.toolkit: Optional[SQLDatabaseToolkit] = None
+        self.toolkit: Optional["SQLDatabaseToolkit"] = None
         self.is_initialized = False
+        self._schema_refresh_task: Optional[asyncio.Task] = None
+        # Bounds concurrent agent runs to stay within the OpenAI rate limit tier
+        self._semaphore = asyncio.Semaphore(get_settings().openai_max_concurrency)
     
     async def initialize(self) -> bool:
         """
@@ -50,25 +74,14 @@ class LangChainAgent:
         try:
             info("Initializing LangChain Agent...")
             
-            # Validate configuration
-            if not self._validate_configuration():
-                return False
-            
-            # Initialize LLM
-            if not self._initialize_llm():
+            # Imports, the database connection and schema introspection all
+            # block, so they run in a worker thread while the loop keeps serving
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, self._initialize_components):
                 return False
             
-            # Initialize database connection
-            if not self._initialize_database():
-                return False
-            
-            # Load prompt template
-            if not self._load_prompt_template():
-                return False
-            
-            # Create agent
-            if not self._create_agent():
-                return False
+            if get_settings().schema_refresh_seconds > 0:
+                self._schema_refresh_task = asyncio.ensure_future(self._refresh_schema_periodically())
             
             self.is_initialized = True
             success("LangChain Agent initialized successfully!")
@@ -78,8 +91,36 @@ class LangChainAgent:
             error(f"Failed to initialize LangChain Agent: {e}")
             return False
     
+    def _initialize_components(self) -> bool:
+        """Set up the LLM, database, prompt and agent, stopping at the first failure"""
+        from langchain_core._api.deprecation import LangChainDeprecationWarning
+        
+        # Ignore LangChain internal deprecation warnings
+        warnings.filterwarnings("ignore", category=LangChainDeprecationWarning)
+        
+        # Validate configuration
+        if not self._validate_configuration():
+            return False
+        
+        # Initialize LLM
+        if not self._initialize_llm():
+            return False
+        
+        # Initialize database connection
+        if not self._initialize_database():
+            return False
+        
+        # Load prompt template
+        if not self._load_prompt_template():
+            return False
+        
+        # Create agent
+        return self._create_agent()
+    
     def _validate_configuration(self) -> bool:
         """Validate required configuration"""
+        settings = get_settings()
+        
         if not settings.supabase_uri:
             error("SUPABASE_URI is missing in configuration")
             return False
@@ -92,10 +133,23 @@ class LangChainAgent:
     
     def _initialize_llm(self) -> bool:
         """Initialize the OpenAI LLM"""
+        settings = get_settings()
+        
         try:
             info(f"Loading OpenAI model: {settings.openai_model}")
             
-            self.llm = ChatOpenAI(**settings.get_openai_config())
+            from langchain_openai import ChatOpenAI
+            
+            # Streaming lets /query/stream forward tokens as they are generated;
+            # stream_usage keeps token usage (incl. cached prompt tokens) reported
+            self.llm = ChatOpenAI(
+                **settings.get_openai_config(),
+                streaming=True,
+                stream_usage=True
+            )
+            
+            # Smaller budget for the toolkit's SQL query checker
+            self.sql_llm = ChatOpenAI(**settings.get_openai_sql_config())
             
             info("OpenAI model loaded successfully")
             return True
@@ -106,13 +160,24 @@ class LangChainAgent:
     
     def _initialize_database(self) -> bool:
         """Initialize database connection"""
+        settings = get_settings()
+        
         try:
             info("Connecting to Supabase database...")
             
-            self.db = SQLDatabase.from_uri(
+            from .langchain_extensions import CachedSQLDatabase
+            
+            # Explicit pool so concurrent queries don't queue on the default 5 connections
+            self.engine = create_engine(
                 settings.supabase_uri,
+                **settings.get_database_config()
+            )
+            self.db = CachedSQLDatabase(
+                engine=self.engine,
                 sample_rows_in_table_info=0  # Performance optimization
             )
+            # Snapshot the schema now rather than on the first question
+            self.db.get_table_info()
             
             info("Database connection established")
             return True
@@ -123,6 +188,8 @@ class LangChainAgent:
     
     def _load_prompt_template(self) -> bool:
         """Load and configure prompt template"""
+        settings = get_settings()
+        
         try:
             info("Loading prompt template...")
             
@@ -136,8 +203,9 @@ class LangChainAgent:
                 error(f"No prompt template found at {prompt_path}")
                 return False
             
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                prompt_content = f.read()
+            from langchain.prompts import PromptTemplate
+            
+            prompt_content = _read_prompt_file(prompt_path)
             
             self.custom_prompt = PromptTemplate.from_template(prompt_content)
             
@@ -150,20 +218,38 @@ class LangChainAgent:
     
     def _create_agent(self) -> bool:
         """Create the SQL agent"""
+        settings = get_settings()
+        
         try:
             info("Creating SQL agent...")
             
+            from langchain_community.agent_toolkits.sql.base import create_sql_agent
+            from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+            
             # Create toolkit
-            self.toolkit = SQLDatabaseToolkit(db=self.db, llm=self.llm)
+            self.toolkit = SQLDatabaseToolkit(db=self.db, llm=self.sql_llm)
             
             # Create agent with default prompt (custom prompt causes parsing errors)
-            self.agent = create_sql_agent(
-                llm=self.llm,
-                toolkit=self.toolkit,
-                verbose=settings.debug,
-                # prompt=self.custom_prompt,  # DISABLED: Causes "I don't know" parsing errors
-                handle_parsing_errors=True
-            )
+            if settings.agent_type == "zero-shot-react-description":
+                self.agent = create_sql_agent(
+                    llm=self.llm,
+                    toolkit=self.toolkit,
+                    verbose=settings.debug,
+                    # prompt=self.custom_prompt,  # DISABLED: Causes "I don't know" parsing errors
+                    agent_executor_kwargs={
+                        "handle_parsing_errors": True,
+                        "return_intermediate_steps": True
+                    }
+                )
+            else:
+                # Native tool calling: no free-text output to parse or repair
+                self.agent = create_sql_agent(
+                    llm=self.llm,
+                    toolkit=self.toolkit,
+                    agent_type=settings.agent_type,
+                    verbose=settings.debug,
+                    agent_executor_kwargs={"return_intermediate_steps": True}
+                )
             
             info("SQL agent created successfully")
             return True
@@ -186,19 +272,19 @@ class LangChainAgent:
         if not self.is_initialized or not self.agent:
             raise RuntimeError("Agent not initialized. Call initialize() first.")
         
+        from langchain_community.callbacks import get_openai_callback
+        
         try:
-            info(f"Processing query: {question}")
+            debug(f"Processing query: {question}")
             
-            # Build input with context if provided
-            input_text = question
-            if context:
-                input_text = f"{context}\n\nQuestion: {question}"
+            # Process with agent without blocking the event loop
+            async with self._semaphore:
+                with get_openai_callback() as usage:
+                    response = await self._ainvoke_with_retry(
+                        {"input": self._build_input(question, context)}
+                    )
             
-            # Process with agent
-            response = self.agent.invoke(
-                {"input": input_text},
-                handle_parsing_errors=True
-            )
+            self._log_token_usage(usage)
             
             return {
                 "success": True,
@@ -218,11 +304,144 @@ class LangChainAgent:
                 "context": context
             }
     
+    async def stream_query(self, question: str, context: str = "") -> AsyncIterator[str]:
+        """
+        Stream the agent's final answer token by token
+        
+        Tool calls are not streamed. With the ReAct agent, intermediate
+        reasoning is skipped and tokens are forwarded once the agent starts
+        writing its final answer.
+        
+        Args:
+            question: Natural language question
+            context: Additional context for the query
+            
+        Yields:
+            Answer tokens as they are generated
+        """
+        if not self.is_initialized or not self.agent:
+            raise RuntimeError("Agent not initialized. Call initialize() first.")
+        
+        from langchain_community.callbacks.openai_info import OpenAICallbackHandler
+        
+        from .langchain_extensions import AnswerStreamHandler, FinalAnswerStreamHandler
+        
+        debug(f"Streaming query: {question}")
+        
+        if get_settings().agent_type == "zero-shot-react-description":
+            handler = FinalAnswerStreamHandler()
+        else:
+            handler = AnswerStreamHandler()
+        usage = OpenAICallbackHandler()
+        
+        streamed = False
+        async with self._semaphore:
+            task = asyncio.create_task(
+                self.agent.ainvoke(
+                    {"input": self._build_input(question, context)},
+                    config={"callbacks": [handler, usage, *self._metrics_callbacks()]}
+                )
+            )
+            # Stop waiting for tokens once the run finishes
+            task.add_done_callback(lambda _: handler.done.set())
+            
+            try:
+                async for token in handler.aiter():
+                    streamed = True
+                    yield token
+                
+                response = await task
+            finally:
+                if not task.done():
+                    task.cancel()
+        
+        self._log_token_usage(usage)
+        
+        if not streamed:
+            yield response.get("output", "No response generated")
+    
+    async def run_sql(self, sql: str) -> List[Tuple[Any, ...]]:
+        """
+        Run a fixed SQL query on the pooled engine, off the event loop
+        
+        Args:
+            sql: SQL query to execute
+            
+        Returns:
+            Result rows as tuples
+        """
+        def fetch_rows() -> List[Tuple[Any, ...]]:
+            with self.engine.connect() as connection:
+                return [tuple(row) for row in connection.execute(text(sql))]
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fetch_rows)
+    
+    async def _refresh_schema_periodically(self):
+        """Refresh the cached database schema in the background"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(get_settings().schema_refresh_seconds)
+            try:
+                await loop.run_in_executor(None, self.db.refresh_schema)
+                info("Database schema cache refreshed")
+            except Exception as e:
+                warning(f"Failed to refresh database schema: {e}")
+    
+    async def _ainvoke_with_retry(self, agent_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the agent, retrying with exponential backoff when OpenAI rate-limits it"""
+        from openai import RateLimitError
+        
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception_type(RateLimitError),
+            wait=wait_exponential_jitter(initial=1, max=20),
+            stop=stop_after_attempt(get_settings().openai_rate_limit_retries),
+            reraise=True
+        ):
+            with attempt:
+                return await self.agent.ainvoke(
+                    agent_input,
+                    config={"callbacks": self._metrics_callbacks()}
+                )
+    
+    def _metrics_callbacks(self) -> list:
+        """Callbacks recording per-step latency metrics, if enabled"""
+        if not metrics_enabled():
+            return []
+        
+        from .langchain_extensions import MetricsCallback
+        
+        return [MetricsCallback()]
+    
+    def _build_input(self, question: str, context: str = "") -> str:
+        """
+        Build the agent input
+        
+        The agent prompt (instructions, schema, tools) always comes first, so the
+        variable part is kept at the end: the question, then any conversation
+        context. This keeps the prompt prefix byte-identical across calls for
+        OpenAI prompt caching.
+        """
+        if context:
+            return f"{question}\n\nConversation context:\n{context}"
+        return question
+    
+    def _log_token_usage(self, usage: "OpenAICallbackHandler"):
+        """Log prompt token usage, including tokens served from OpenAI's prompt cache"""
+        success(
+            f"Agent used {usage.prompt_tokens} prompt tokens "
+            f"({usage.prompt_tokens_cached} cached) and "
+            f"{usage.completion_tokens} completion tokens",
+            prompt_tokens=usage.prompt_tokens,
+            cached_prompt_tokens=usage.prompt_tokens_cached,
+            completion_tokens=usage.completion_tokens
+        )
+    
     def get_status(self) -> Dict[str, Any]:
         """Get agent status information"""
         return {
             "is_initialized": self.is_initialized,
-            "llm_model": settings.openai_model if self.llm else None,
+            "llm_model": get_settings().openai_model if self.llm else None,
             "database_connected": self.db is not None,
             "agent_ready": self.agent is not None,
             "toolkit_tools": len(self.toolkit.get_tools()) if self.toolkit else 0
@@ -233,14 +452,21 @@ class LangChainAgent:
         try:
             info("Cleaning up LangChain Agent resources...")
             
+            if self._schema_refresh_task:
+                self._schema_refresh_task.cancel()
+                self._schema_refresh_task = None
+            
             self.agent = None
             self.toolkit = None
             
-            if self.db:
-                # Close database connections if applicable
-                self.db = None
+            if self.engine:
+                # Close pooled database connections
+                self.engine.dispose()
+                self.engine = None
+            self.db = None
             
             self.llm = None
+            self.sql_llm = None
             self.is_initialized = False
             
             info("Agent cleanup completed")
@@ -249,30 +475,83 @@ class LangChainAgent:
             warning(f"Error during cleanup: {e}")
 
 
-# Global agent instance
+# Global agent instance, created lazily in each worker process
 _agent_instance: Optional[LangChainAgent] = None
+_agent_lock: Optional[asyncio.Lock] = None
+# Last failed initialization, returned to callers until the retry cooldown ends
+_failed_agent: Optional[LangChainAgent] = None
+_agent_failed_at: float = 0.0
 
 
 async def get_agent() -> LangChainAgent:
     """
     Get or create the global agent instance
     
+    After a failed initialization, callers get the uninitialized agent back
+    without a new attempt for ``agent_init_retry_seconds``, so an outage of
+    the database or OpenAI does not start a full initialization per request.
+    
     Returns:
-        Initialized LangChain agent
+        LangChain agent, uninitialized if initialization failed
     """
-    global _agent_instance
+    global _agent_instance, _agent_lock, _failed_agent, _agent_failed_at
     
     if _agent_instance is None:
-        _agent_instance = LangChainAgent()
-        await _agent_instance.initialize()
+        # Created here so the lock binds to the server's running loop
+        if _agent_lock is None:
+            _agent_lock = asyncio.Lock()
+        
+        # Concurrent first requests must not each build their own agent
+        async with _agent_lock:
+            if _agent_instance is None:
+                if _failed_agent is not None and (
+                    time.monotonic() - _agent_failed_at < get_settings().agent_init_retry_seconds
+                ):
+                    return _failed_agent
+                
+                agent = LangChainAgent()
+                if not await agent.initialize():
+                    _failed_agent, _agent_failed_at = agent, time.monotonic()
+                    return agent
+                _agent_instance = agent
+                _failed_agent = None
     
     return _agent_instance
 
 
+def get_ready_agent() -> Optional[LangChainAgent]:
+    """
+    Get the global agent if it is initialized, without creating it
+    
+    Returns:
+        Initialized LangChain agent, or None
+    """
+    return _agent_instance
+
+
+def get_agent_status() -> Dict[str, Any]:
+    """
+    Get the global agent's status without creating or initializing it
+    
+    Returns:
+        Agent status information
+    """
+    if _agent_instance is None:
+        return {
+            "is_initialized": False,
+            "llm_model": None,
+            "database_connected": False,
+            "agent_ready": False,
+            "toolkit_tools": 0
+        }
+    return _agent_instance.get_status()
+
+
 async def cleanup_agent():
     """Cleanup the global agent instance"""
-    global _agent_instance
+    global _agent_instance, _failed_agent
     
+    _failed_agent = None
     if _agent_instance:
         await _agent_instance.cleanup()
         _agent_instance = None 
\ No newline at end of file
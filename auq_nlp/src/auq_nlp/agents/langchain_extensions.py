@@ -0,0 +1,167 @@
+"""
+LangChain Extensions for AUQ NLP
+
+Subclasses of LangChain components used by the SQL agent. They live apart
+from the agent module, which only imports LangChain once the agent is
+initialized.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from uuid import UUID
+
+from langchain.callbacks.streaming_aiter import AsyncIteratorCallbackHandler
+from langchain.callbacks.streaming_aiter_final_only import AsyncFinalIteratorCallbackHandler
+from langchain_community.utilities import SQLDatabase
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy import MetaData
+
+from ..utils.metrics import LLM_CALL_SECONDS, SQL_TOOL_SECONDS
+
+
+class DrainingIteratorMixin:
+    """
+    Async iteration over streamed tokens that drains the queue before stopping
+    
+    Unlike LangChain's iterator handlers, queued tokens are always yielded
+    before the iterator stops, so tokens are not dropped when the run
+    finishes while the consumer is still behind.
+    """
+    
+    async def aiter(self) -> AsyncIterator[str]:
+        while True:
+            if not self.queue.empty():
+                yield self.queue.get_nowait()
+                continue
+            
+            if self.done.is_set():
+                return
+            
+            next_token = asyncio.ensure_future(self.queue.get())
+            finished = asyncio.ensure_future(self.done.wait())
+            completed, pending = await asyncio.wait(
+                {next_token, finished},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in pending:
+                task.cancel()
+            
+            if next_token in completed:
+                yield next_token.result()
+
+
+class FinalAnswerStreamHandler(DrainingIteratorMixin, AsyncFinalIteratorCallbackHandler):
+    """Async iterator over the final answer tokens of a ReAct agent"""
+
+
+class AnswerStreamHandler(DrainingIteratorMixin, AsyncIteratorCallbackHandler):
+    """
+    Async iterator over the answer tokens of a tool-calling agent
+    
+    Tool calls carry no content tokens, so every content token belongs to the
+    answer. A run makes several LLM calls, so ``done`` is not set when one
+    ends; the caller sets it once the whole run has finished.
+    """
+    
+    async def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any):
+        pass
+    
+    async def on_llm_end(self, response: Any, **kwargs: Any):
+        pass
+    
+    async def on_llm_error(self, error: BaseException, **kwargs: Any):
+        pass
+
+
+class MetricsCallback(BaseCallbackHandler):
+    """
+    Records the duration of each LLM call and SQL tool call of an agent run
+    
+    Durations are observed into the Prometheus histograms from
+    ``utils.metrics``, so latency can be split between the model and the
+    database.
+    """
+    
+    run_inline = True
+    
+    def __init__(self):
+        self._started: Dict[UUID, tuple] = {}
+    
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or "unknown"
+        self._started[run_id] = (time.perf_counter(), model)
+    
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        self._observe_llm(run_id)
+    
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._observe_llm(run_id)
+    
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        tool = (serialized or {}).get("name") or "unknown"
+        self._started[run_id] = (time.perf_counter(), tool)
+    
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._observe_tool(run_id)
+    
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._observe_tool(run_id)
+    
+    def _observe_llm(self, run_id: UUID):
+        started = self._started.pop(run_id, None)
+        if started:
+            LLM_CALL_SECONDS.labels(model=started[1]).observe(time.perf_counter() - started[0])
+    
+    def _observe_tool(self, run_id: UUID):
+        started = self._started.pop(run_id, None)
+        if started:
+            SQL_TOOL_SECONDS.labels(tool=started[1]).observe(time.perf_counter() - started[0])
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase serving table info from an in-memory snapshot
+    
+    The schema tool asks for table info on most questions; rendering it from
+    the cache avoids re-reflecting and re-compiling the DDL every time.
+    ``refresh_schema`` re-reflects the database to pick up schema changes.
+    """
+    
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._table_info_cache: Dict[str, str] = {}
+    
+    def get_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        names = list(self.get_usable_table_names()) if table_names is None else table_names
+        
+        tables = []
+        for name in names:
+            table_info = self._table_info_cache.get(name)
+            if table_info is None:
+                # Raises for unknown tables, like the uncached implementation
+                table_info = super().get_table_info([name])
+                self._table_info_cache[name] = table_info
+            tables.append(table_info)
+        
+        tables.sort()
+        return "\n\n".join(tables)
+    
+    def refresh_schema(self):
+        """Re-reflect the database and rebuild the table info snapshot"""
+        metadata = MetaData()
+        metadata.reflect(
+            views=self._view_support,
+            bind=self._engine,
+            only=list(self._usable_tables),
+            schema=self._schema
+        )
+        self._metadata = metadata
+        
+        # Build the new snapshot before swapping it in, so readers never see it empty
+        table_info = {
+            name: SQLDatabase.get_table_info(self, [name])
+            for name in self.get_usable_table_names()
+        }
+        self._table_info_cache = table_info
@@ -5,14 +5,19 @@ Orchestrates the complete query processing pipeline including caching,
 validation, agent processing, and response formatting.
 """
 
+import asyncio
 import time
-from typing import Dict, Any, Optional, Tuple
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
-from .langchain_agent import get_agent
+from .langchain_agent import get_agent, get_ready_agent
+from .session_memory import SessionMemory
 from ..core.cache import QueryCache, PrecompiledQueries
+from ..core.semantic_cache import LocalEmbeddings, SemanticCache
 from ..core.validator import ResultValidator
-from ..core.config import settings
-from ..utils.logging import get_logger, info, success, warning, error
+from ..core.config import get_settings
+from ..utils.logging import get_logger, debug, info, success, warning, error
 
 logger = get_logger(__name__)
 
@@ -23,7 +28,7 @@ class QueryProcessor:
     
     Handles the complete lifecycle:
     1. Check precompiled queries
-    2. Check cache
+    2. Check cache (exact match, then semantic similarity)
     3. Process with LangChain agent
     4. Validate results
     5. Cache response
@@ -31,14 +36,90 @@ class QueryProcessor:
     """
     
     def __init__(self):
-        self.cache = QueryCache() if settings.cache_enabled else None
+        settings = get_settings()
+        self.cache = self._create_query_cache()
+        self.semantic_cache = self._create_semantic_cache()
+        self.memory = SessionMemory(
+            recent_messages=settings.max_conversation_history,
+            recent_token_budget=settings.memory_recent_token_budget,
+            max_sessions=settings.memory_max_sessions
+        )
         self.validator = ResultValidator() if settings.validation_enabled else None
+        self._inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        # Agent acquisition shared by the requests arriving before it is ready
+        self._agent_task: Optional["asyncio.Future[Any]"] = None
+        # Embedded precompiled query patterns, one row per pattern, set by warm_up
+        self._precompiled_vectors: Optional[Any] = None
+        self._precompiled_queries: List[Dict[str, Any]] = []
+    
+    def _create_query_cache(self) -> Optional[QueryCache]:
+        """Create the exact-match cache, backed by SQLite if configured"""
+        settings = get_settings()
+        
+        if not settings.cache_enabled:
+            return None
+        
+        path = None
+        if settings.cache_file:
+            path = Path(settings.cache_file)
+            if not path.is_absolute():
+                path = settings.base_dir / path
+        
+        try:
+            return QueryCache(
+                max_size=settings.cache_max_size,
+                ttl_seconds=settings.cache_ttl_seconds,
+                path=path,
+                disk_max_size=settings.cache_disk_max_size
+            )
+        except Exception as e:
+            warning(f"Failed to open query cache file {path}, using memory only: {e}")
+            return QueryCache(
+                max_size=settings.cache_max_size,
+                ttl_seconds=settings.cache_ttl_seconds
+            )
+    
+    def _create_semantic_cache(self) -> Optional[SemanticCache]:
+        """Create the embedding-based cache if enabled"""
+        settings = get_settings()
+        
+        if not (settings.cache_enabled and settings.semantic_cache_enabled):
+            return None
+        
+        try:
+            if settings.semantic_cache_backend == "local":
+                # Embeds in-process, no network round trip per question
+                model_name = settings.semantic_cache_local_model
+                embeddings = LocalEmbeddings(model_name)
+                threshold = settings.semantic_cache_local_threshold
+            else:
+                from langchain_openai import OpenAIEmbeddings
+                
+                model_name = settings.semantic_cache_model
+                embeddings = OpenAIEmbeddings(
+                    model=model_name,
+                    openai_api_key=settings.openai_api_key
+                )
+                threshold = settings.semantic_cache_threshold
+            
+            return SemanticCache(
+                embeddings,
+                max_size=settings.semantic_cache_max_size,
+                threshold=threshold,
+                ttl_seconds=settings.cache_ttl_seconds,
+                model_name=model_name
+            )
+        except Exception as e:
+            warning(f"Semantic cache disabled: {e}")
+            return None
     
     async def process_query(
         self,
         question: str,
         context: str = "",
-        conversation_history: Optional[list] = None
+        conversation_history: Optional[list] = None,
+        session_id: Optional[str] = None,
+        include_steps: bool = False
     ) -> Dict[str, Any]:
         """
         Process a natural language query through the complete pipeline
@@ -47,81 +128,46 @@ class QueryProcessor:
             question: Natural language question
             context: Additional context for the query
             conversation_history: Previous conversation for context
+            session_id: Server-side conversation session, replaces resending history
+            include_steps: Whether to return the agent's tool calls with the answer
             
         Returns:
             Formatted response with metadata
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            info(f"Processing query: {question}")
-            
-            # Build enriched context
-            full_context = self._build_context(context, conversation_history)
-            
-            # Step 1: Check precompiled queries (instant response)
-            precompiled_result = self._check_precompiled_queries(question)
-            if precompiled_result:
-                return self._format_response(
-                    question=question,
-                    context=full_context,
-                    result=precompiled_result,
-                    processing_time=time.time() - start_time,
-                    cached=True,
-                    precompiled=True
-                )
+            debug(f"Processing query: {question}")
             
-            # Step 2: Check cache
-            cached_result = None
-            if self.cache:
-                cached_result = self.cache.get(question, full_context)
-                if cached_result:
-                    info("Cache hit - returning cached result")
-                    return self._format_response(
-                        question=question,
-                        context=full_context,
-                        result=cached_result,
-                        processing_time=time.time() - start_time,
-                        cached=True,
-                        precompiled=False
-                    )
+            # Caches are scoped by the conversation as sent; the agent's context,
+            # which may need a summary call, is only built on a miss
+            cache_context = self._cache_context(context, conversation_history, session_id)
+            build_context = partial(self._build_context, context, conversation_history, session_id)
             
-            # Step 3: Process with LangChain agent
-            info("Cache miss - processing with LangChain agent")
-            agent = await get_agent()
-            agent_response = await agent.process_query(question, full_context)
+            # Steps 1-5: Answer from precompiled queries, caches or the agent,
+            # sharing the run with identical questions already in flight
+            answer = await self._coalesced_answer(question, cache_context, build_context)
             
-            if not agent_response.get("success", False):
-                error(f"Agent processing failed: {agent_response.get('error')}")
+            if not answer["success"]:
                 return self._format_error_response(
                     question=question,
-                    context=full_context,
-                    error=agent_response.get("error", "Agent processing failed"),
-                    processing_time=time.time() - start_time
+                    context=context,
+                    error=answer["error"],
+                    processing_time=time.perf_counter() - start_time
                 )
             
-            # Step 4: Validate results
-            validation_warnings = []
-            if self.validator:
-                # Note: Using a more specific validation method
-                # TODO: Implement proper response validation based on query type
-                validation_warnings = []  # Skip validation for now
-            
-            # Step 5: Cache the result
-            if self.cache and agent_response.get("success", False):
-                self.cache.set(question, full_context, agent_response["output"])
-                info("Result cached for future queries")
+            self.memory.add_exchange(session_id, question, answer["output"])
             
             # Step 6: Format and return response
             return self._format_response(
                 question=question,
-                context=full_context,
-                result=agent_response["output"],
-                processing_time=time.time() - start_time,
-                cached=False,
-                precompiled=False,
-                validation_warnings=validation_warnings,
-                intermediate_steps=agent_response.get("intermediate_steps", [])
+                context=context,
+                result=answer["output"],
+                processing_time=time.perf_counter() - start_time,
+                cached=answer["cached"],
+                precompiled=answer["precompiled"],
+                validation_warnings=answer.get("validation_warnings"),
+                intermediate_steps=answer.get("intermediate_steps") if include_steps else None
             )
             
         except Exception as e:
@@ -130,41 +176,461 @@ class QueryProcessor:
                 question=question,
                 context=context,
                 error=str(e),
-                processing_time=time.time() - start_time
+                processing_time=time.perf_counter() - start_time
             )
     
-    def _check_precompiled_queries(self, question: str) -> Optional[str]:
-        """Check if question matches a precompiled query"""
-        if not settings.enable_precompiled_queries:
+    async def stream_query(
+        self,
+        question: str,
+        context: str = "",
+        conversation_history: Optional[list] = None,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a query through the pipeline, streaming the answer as it is generated
+        
+        Precompiled and cached answers are emitted as a single token event; cache
+        misses stream the agent's final answer token by token.
+        
+        Args:
+            question: Natural language question
+            context: Additional context for the query
+            conversation_history: Previous conversation for context
+            session_id: Server-side conversation session, replaces resending history
+            
+        Yields:
+            ``{"type": "token", "content": ...}`` events, followed by a single
+            ``{"type": "done", ...}`` or ``{"type": "error", ...}`` event
+        """
+        start_time = time.perf_counter()
+        
+        try:
+            debug(f"Streaming query: {question}")
+            cache_context = self._cache_context(context, conversation_history, session_id)
+            
+            cache_key = await self._make_cache_key(question, cache_context)
+            agent_task = self._warm_up_agent()
+            cached_result, precompiled, question_vector = await self._find_cached_answer(
+                question, cache_context, agent_task, cache_key
+            )
+            if cached_result:
+                self.memory.add_exchange(session_id, question, cached_result)
+                yield {"type": "token", "content": cached_result}
+                yield {
+                    "type": "done",
+                    **self._format_response(
+                        question=question,
+                        context=context,
+                        result=cached_result,
+                        processing_time=time.perf_counter() - start_time,
+                        cached=True,
+                        precompiled=precompiled
+                    )
+                }
+                return
+            
+            # An identical /query is already running: reuse its answer
+            inflight = self._inflight.get(cache_key)
+            if inflight is not None:
+                debug("Identical query in flight - waiting for its answer")
+                answer = await asyncio.shield(inflight)
+                if not answer["success"]:
+                    raise RuntimeError(answer["error"])
+                
+                self.memory.add_exchange(session_id, question, answer["output"])
+                yield {"type": "token", "content": answer["output"]}
+                yield {
+                    "type": "done",
+                    **self._format_response(
+                        question=question,
+                        context=context,
+                        result=answer["output"],
+                        processing_time=time.perf_counter() - start_time,
+                        cached=answer["cached"],
+                        precompiled=answer["precompiled"]
+                    )
+                }
+                return
+            
+            debug("Cache miss - streaming with LangChain agent")
+            full_context = await self._build_context(context, conversation_history, session_id)
+            agent = await agent_task
+            tokens = []
+            async for token in agent.stream_query(question, full_context):
+                tokens.append(token)
+                yield {"type": "token", "content": token}
+            
+            answer = "".join(tokens).strip()
+            self._cache_answer(question, cache_context, answer, question_vector, cache_key)
+            self.memory.add_exchange(session_id, question, answer)
+            yield {
+                "type": "done",
+                **self._format_response(
+                    question=question,
+                    context=context,
+                    result=answer,
+                    processing_time=time.perf_counter() - start_time,
+                    cached=False,
+                    precompiled=False
+                )
+            }
+            
+        except Exception as e:
+            error(f"Error in query streaming pipeline: {e}")
+            yield {
+                "type": "error",
+                **self._format_error_response(
+                    question=question,
+                    context=context,
+                    error=str(e),
+                    processing_time=time.perf_counter() - start_time
+                )
+            }
+    
+    async def _coalesced_answer(
+        self,
+        question: str,
+        cache_context: str,
+        build_context: Callable[[], Awaitable[str]]
+    ) -> Dict[str, Any]:
+        """
+        Answer a question, joining an identical request that is already in flight
+        
+        The answer is computed in its own task, so a caller that disconnects
+        does not cancel the run for the others waiting on it.
+        """
+        # The cache key doubles as the in-flight key, so it is computed once
+        key = await self._make_cache_key(question, cache_context)
+        task = self._inflight.get(key)
+        
+        if task is None:
+            task = asyncio.ensure_future(self._answer(question, cache_context, key, build_context))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            debug("Identical query in flight - waiting for its answer")
+        
+        return await asyncio.shield(task)
+    
+    @staticmethod
+    async def _make_cache_key(question: str, cache_context: str) -> str:
+        """
+        Compute the cache key, hashing long contexts in a worker thread
+        
+        hashlib releases the GIL on large inputs, so other requests keep
+        being served while a long conversation context is hashed.
+        """
+        if len(cache_context) > get_settings().cache_key_offload_bytes:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, QueryCache.make_key, question, cache_context)
+        return QueryCache.make_key(question, cache_context)
+    
+    async def _answer(
+        self,
+        question: str,
+        cache_context: str,
+        cache_key: str,
+        build_context: Callable[[], Awaitable[str]]
+    ) -> Dict[str, Any]:
+        """
+        Answer a question from precompiled queries, caches or the agent
+        
+        Args:
+            question: Natural language question
+            cache_context: Context the caches are scoped by, see ``_cache_context``
+            cache_key: ``QueryCache.make_key`` of the question and ``cache_context``
+            build_context: Builds the agent's context, only awaited on a miss
+        
+        Returns:
+            Dict with ``success`` and either the answer ``output`` and its
+            metadata, or an ``error``
+        """
+        agent_task = self._warm_up_agent()
+        cached_result, precompiled, question_vector = await self._find_cached_answer(
+            question, cache_context, agent_task, cache_key
+        )
+        if cached_result:
+            return {
+                "success": True,
+                "output": cached_result,
+                "cached": True,
+                "precompiled": precompiled
+            }
+        
+        debug("Cache miss - processing with LangChain agent")
+        full_context = await build_context()
+        agent = await agent_task
+        agent_response = await agent.process_query(question, full_context)
+        
+        if not agent_response.get("success", False):
+            error(f"Agent processing failed: {agent_response.get('error')}")
+            return {
+                "success": False,
+                "error": agent_response.get("error", "Agent processing failed")
+            }
+        
+        # Validate results
+        validation_warnings = []
+        if self.validator:
+            # Note: Using a more specific validation method
+            # TODO: Implement proper response validation based on query type
+            validation_warnings = []  # Skip validation for now
+        
+        self._cache_answer(
+            question, cache_context, agent_response["output"], question_vector, cache_key
+        )
+        
+        return {
+            "success": True,
+            "output": agent_response["output"],
+            "cached": False,
+            "precompiled": False,
+            "validation_warnings": validation_warnings,
+            "intermediate_steps": self._compact_steps(agent_response.get("intermediate_steps", []))
+        }
+    
+    @staticmethod
+    def _compact_steps(steps: list) -> list:
+        """Reduce agent steps to their tool calls, with truncated observations"""
+        limit = get_settings().intermediate_step_max_chars
+        compact = []
+        for action, observation in steps:
+            observation = str(observation)
+            if len(observation) > limit:
+                observation = observation[:limit] + "..."
+            compact.append({
+                "tool": getattr(action, "tool", ""),
+                "tool_input": getattr(action, "tool_input", ""),
+                "observation": observation
+            })
+        return compact
+    
+    def _warm_up_agent(self) -> "asyncio.Future[Any]":
+        """
+        Start acquiring the agent while the caches are checked
+        
+        On a cold start, agent initialization overlaps the semantic cache
+        lookup. On a cache hit the task is left to finish, so the agent is
+        ready for the next miss. Once the agent is ready no task is started,
+        and requests arriving while it is acquired share one task.
+        """
+        agent = get_ready_agent()
+        if agent is not None:
+            ready = asyncio.get_running_loop().create_future()
+            ready.set_result(agent)
+            return ready
+        
+        if self._agent_task is None or self._agent_task.done():
+            self._agent_task = asyncio.ensure_future(get_agent())
+            # Retrieve any exception, as the task is not awaited on a cache hit
+            self._agent_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        
+        # A request that is cancelled while waiting must not cancel the shared task
+        agent_task = asyncio.shield(self._agent_task)
+        agent_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return agent_task
+    
+    async def _find_cached_answer(
+        self,
+        question: str,
+        cache_context: str,
+        agent_task: "asyncio.Future[Any]",
+        cache_key: Optional[str] = None
+    ) -> Tuple[Optional[str], bool, Optional[Any]]:
+        """
+        Look the question up in the precompiled queries and caches
+        
+        Precompiled queries run on the agent's database, so ``agent_task``
+        (from ``_warm_up_agent``) is awaited only when one matches. Questions
+        that don't contain a precompiled pattern can still match one by
+        embedding similarity, once the patterns are embedded by ``warm_up``.
+        
+        Returns:
+            Tuple of (cached answer or None, whether it was precompiled,
+            question embedding to reuse when caching a fresh answer)
+        """
+        precompiled_result = await self._check_precompiled_queries(question, agent_task)
+        if precompiled_result:
+            return precompiled_result, True, None
+        
+        if self.cache:
+            cached_result = await self._cache_get(question, cache_context, cache_key)
+            if cached_result:
+                debug("Cache hit - returning cached result")
+                return cached_result, False, None
+        
+        question_vector = None
+        if self.semantic_cache:
+            cached_result = None
+            try:
+                question_vector = await self.semantic_cache.embed(question)
+            except Exception as e:
+                warning(f"Semantic cache lookup failed: {e}")
+            
+            query_info = self._match_precompiled_vector(question_vector)
+            if query_info:
+                debug("Precompiled query matched by similarity")
+                precompiled_result = await self._run_precompiled(query_info, agent_task)
+                if precompiled_result:
+                    return precompiled_result, True, question_vector
+            
+            if question_vector is not None:
+                cached_result = self.semantic_cache.lookup(question_vector, cache_context)
+            
+            if cached_result:
+                debug("Semantic cache hit - returning cached result")
+                if self.cache:
+                    self._cache_set(question, cached_result, cache_context, cache_key)
+                return cached_result, False, question_vector
+        
+        return None, False, question_vector
+    
+    def _cache_answer(
+        self,
+        question: str,
+        cache_context: str,
+        answer: str,
+        question_vector: Optional[Any] = None,
+        cache_key: Optional[str] = None
+    ):
+        """Store a freshly generated answer in the caches"""
+        if not self.cache or not answer:
+            return
+        
+        self._cache_set(question, answer, cache_context, cache_key)
+        if self.semantic_cache and question_vector is not None:
+            self.semantic_cache.add(question_vector, question, answer, cache_context)
+        debug("Result cached for future queries")
+    
+    async def _cache_get(
+        self,
+        question: str,
+        cache_context: str,
+        cache_key: Optional[str] = None
+    ) -> Optional[str]:
+        """Look up the exact-match cache, reading its SQLite file in a worker thread"""
+        cached_result = self.cache.get(question, cache_context, key=cache_key, disk=False)
+        if cached_result is not None or not self.cache.disk_enabled:
+            return cached_result
+        
+        key = cache_key or QueryCache.make_key(question, cache_context)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self.cache.load, question, key)
+        except Exception as e:
+            warning(f"Query cache file lookup failed: {e}")
+            return None
+    
+    def _cache_set(
+        self,
+        question: str,
+        answer: str,
+        cache_context: str,
+        cache_key: Optional[str] = None
+    ):
+        """Store an answer in the exact-match cache, writing its SQLite file in the background"""
+        key = cache_key or QueryCache.make_key(question, cache_context)
+        self.cache.set(question, answer, cache_context, key=key, disk=False)
+        if not self.cache.disk_enabled:
+            return
+        
+        # SQLite can wait up to its timeout on another worker's write lock
+        loop = asyncio.get_running_loop()
+        write = loop.run_in_executor(None, self.cache.persist, key, answer)
+        write.add_done_callback(self._log_cache_write_error)
+    
+    @staticmethod
+    def _log_cache_write_error(write: "asyncio.Future[None]"):
+        """Report a failed background cache file write"""
+        if not write.cancelled() and write.exception() is not None:
+            warning(f"Query cache file write failed: {write.exception()}")
+    
+    async def _check_precompiled_queries(
+        self,
+        question: str,
+        agent_task: "asyncio.Future[Any]"
+    ) -> Optional[str]:
+        """Answer a question matching a precompiled query from the database"""
+        if not get_settings().enable_precompiled_queries:
+            return None
+        
+        query_info = PrecompiledQueries.find_matching_query(question)
+        if not query_info:
+            return None
+        
+        debug("Precompiled query match found")
+        return await self._run_precompiled(query_info, agent_task)
+    
+    async def _run_precompiled(
+        self,
+        query_info: Dict[str, Any],
+        agent_task: "asyncio.Future[Any]"
+    ) -> Optional[str]:
+        """Run a precompiled query and format its rows, None if it fails"""
+        try:
+            # Reuses the agent's pooled engine instead of connecting per query
+            agent = await agent_task
+            rows = await agent.run_sql(query_info["sql"])
+        except Exception as e:
+            warning(f"Precompiled query failed, falling back to agent: {e}")
+            return None
+        
+        return PrecompiledQueries.format_response(query_info["response_template"], rows)
+    
+    def _match_precompiled_vector(self, question_vector: Optional[Any]) -> Optional[Dict[str, Any]]:
+        """Find the precompiled query whose pattern embedding is closest to the question"""
+        if self._precompiled_vectors is None or question_vector is None:
             return None
         
-        result = PrecompiledQueries.get_response(question)
-        if result:
-            info(f"Precompiled query match found")
-            # Return a simple response for now - TODO: Execute SQL and format properly
-            return f"Found precompiled query for: {question}. SQL: {result.get('sql', '')}"
+        # One matrix-vector product against every pattern
+        scores = self._precompiled_vectors @ question_vector
+        best = int(scores.argmax())
+        if scores[best] < get_settings().precompiled_vector_threshold:
+            return None
+        return self._precompiled_queries[best]
+    
+    async def _embed_precompiled_patterns(self) -> bool:
+        """Embed every precompiled query pattern once, for matching by similarity"""
+        if not (self.semantic_cache and get_settings().enable_precompiled_queries):
+            return False
         
-        return None
+        patterns = [
+            (pattern, query_info)
+            for query_info in PrecompiledQueries.COMMON_QUERIES.values()
+            for pattern in query_info["patterns"]
+        ]
+        self._precompiled_vectors = await self.semantic_cache.embed_many(
+            [pattern for pattern, _ in patterns]
+        )
+        self._precompiled_queries = [query_info for _, query_info in patterns]
+        return True
+    
+    def _cache_context(
+        self,
+        context: str,
+        conversation_history: Optional[list],
+        session_id: Optional[str] = None
+    ) -> str:
+        """Scope cache entries by the caller's context and the raw conversation history"""
+        # A new session takes the client's history first, so hits keep it too
+        self.memory.open_session(session_id, conversation_history)
+        history = self.memory.history_key(conversation_history, session_id)
+        return "\n\n".join(part for part in (context, history) if part)
     
-    def _build_context(self, context: str, conversation_history: Optional[list]) -> str:
-        """Build enriched context from provided context and conversation history"""
+    async def _build_context(
+        self,
+        context: str,
+        conversation_history: Optional[list],
+        session_id: Optional[str] = None
+    ) -> str:
+        """Build enriched context from provided context and conversation memory"""
         context_parts = []
         
         if context:
             context_parts.append(context)
         
-        if conversation_history:
-            # Limit conversation history
-            max_history = settings.max_conversation_history
-            recent_history = conversation_history[-max_history:] if len(conversation_history) > max_history else conversation_history
-            
-            history_text = "Previous conversation:\n"
-            for i, exchange in enumerate(recent_history, 1):
-                if isinstance(exchange, dict):
-                    q = exchange.get("question", "")
-                    a = exchange.get("answer", "")
-                    history_text += f"{i}. Q: {q}\n   A: {a}\n"
-            
+        history_text = await self.memory.build_context(conversation_history, session_id)
+        if history_text:
             context_parts.append(history_text)
         
         return "\n\n".join(context_parts)
@@ -180,7 +646,15 @@ class QueryProcessor:
         validation_warnings: Optional[list] = None,
         intermediate_steps: Optional[list] = None
     ) -> Dict[str, Any]:
-        """Format successful response"""
+        """Format successful response, logging it as the query's one summary line"""
+        info(
+            f"Query answered in {processing_time * 1000:.0f} ms "
+            f"(cached: {cached}, precompiled: {precompiled})",
+            question=question,
+            cached=cached,
+            precompiled=precompiled,
+            processing_ms=round(processing_time * 1000, 1)
+        )
         return {
             "success": True,
             "answer": result,
@@ -192,7 +666,7 @@ class QueryProcessor:
             "validation_warnings": validation_warnings or [],
             "intermediate_steps": intermediate_steps or [],
             "timestamp": time.time(),
-            "model": settings.openai_model
+            "model": get_settings().openai_model
         }
     
     def _format_error_response(
@@ -215,7 +689,7 @@ class QueryProcessor:
             "validation_warnings": [],
             "intermediate_steps": [],
             "timestamp": time.time(),
-            "model": settings.openai_model
+            "model": get_settings().openai_model
         }
     
     def get_cache_stats(self) -> Dict[str, Any]:
@@ -226,7 +700,8 @@ class QueryProcessor:
         stats = self.cache.get_stats()
         return {
             "cache_enabled": True,
-            **stats
+            **stats,
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else None
         }
     
     def clear_cache(self) -> bool:
@@ -235,11 +710,82 @@ class QueryProcessor:
             return False
         
         self.cache.clear()
+        self.memory.clear()
+        if self.semantic_cache:
+            self.semantic_cache.clear()
         info("Query cache cleared")
         return True
     
+    def _semantic_cache_path(self) -> Optional[Path]:
+        """Resolve the semantic cache persistence file, if configured"""
+        settings = get_settings()
+        
+        if not self.semantic_cache or not settings.semantic_cache_file:
+            return None
+        
+        path = Path(settings.semantic_cache_file)
+        return path if path.is_absolute() else settings.base_dir / path
+    
+    async def warm_up(self) -> bool:
+        """
+        Initialize the agent and the embedding model ahead of the first query
+        
+        Returns:
+            bool: True if every component is ready, False otherwise
+        """
+        ready = True
+        
+        try:
+            agent = await get_agent()
+            ready = agent.is_initialized
+        except Exception as e:
+            warning(f"Failed to prewarm agent: {e}")
+            ready = False
+        
+        if self.semantic_cache:
+            try:
+                # Loads a local model, or opens the connection to the embeddings API;
+                # embedding the precompiled patterns does both when they are enabled
+                if not await self._embed_precompiled_patterns():
+                    await self.semantic_cache.embed("warm up")
+            except Exception as e:
+                warning(f"Failed to prewarm embeddings: {e}")
+                ready = False
+        
+        return ready
+    
+    def load_semantic_cache(self) -> int:
+        """Restore the semantic cache from disk"""
+        path = self._semantic_cache_path()
+        if not path:
+            return 0
+        
+        try:
+            restored = self.semantic_cache.load(path)
+            info(f"Restored {restored} semantic cache entries from {path}")
+            return restored
+        except Exception as e:
+            warning(f"Failed to restore semantic cache: {e}")
+            return 0
+    
+    def save_semantic_cache(self) -> bool:
+        """Persist the semantic cache to disk"""
+        path = self._semantic_cache_path()
+        if not path:
+            return False
+        
+        try:
+            self.semantic_cache.save(path)
+            info(f"Semantic cache saved to {path}")
+            return True
+        except Exception as e:
+            warning(f"Failed to save semantic cache: {e}")
+            return False
+    
     def get_status(self) -> Dict[str, Any]:
         """Get processor status"""
+        settings = get_settings()
+        
         return {
             "cache_enabled": self.cache is not None,
             "validation_enabled": self.validator is not None,
@@ -249,6 +795,7 @@ class QueryProcessor:
                 "openai_model": settings.openai_model,
                 "cache_max_size": settings.cache_max_size,
                 "cache_ttl_seconds": settings.cache_ttl_seconds,
+                "semantic_cache_enabled": self.semantic_cache is not None,
                 "max_conversation_history": settings.max_conversation_history
             }
         }
@@ -276,4 +823,6 @@ def get_processor() -> QueryProcessor:
 def reset_processor():
     """Reset the global processor instance"""
     global _processor_instance
+    if _processor_instance is not None and _processor_instance.cache:
+        _processor_instance.cache.close()
     _processor_instance = None 
\ No newline at end of file
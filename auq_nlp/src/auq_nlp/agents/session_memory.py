@@ -0,0 +1,312 @@
+"""
+Session Memory for AUQ NLP
+
+Conversation memory that keeps only the most recent messages verbatim and
+folds older ones into an LLM-generated running summary, so prompt size stays
+bounded on long conversations.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import tiktoken
+
+from ..core.config import get_settings
+from ..utils.logging import get_logger, warning
+
+logger = get_logger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation between a user and an urban data "
+    "assistant in at most three sentences. Keep district names, cities, "
+    "indicators, years and figures that later questions may refer to.\n\n"
+    "{summary}{messages}\n\nSummary:"
+)
+
+
+# Seconds to wait before loading the tokenizer again after a failure
+_ENCODING_RETRY_SECONDS = 60
+
+_encoding: Optional[tiktoken.Encoding] = None
+_encoding_failed_at: Optional[float] = None
+
+
+def _get_encoding() -> Optional[tiktoken.Encoding]:
+    """Load the tokenizer of the agent model once it is available"""
+    global _encoding, _encoding_failed_at
+
+    if _encoding is not None:
+        return _encoding
+    if _encoding_failed_at and time.monotonic() - _encoding_failed_at < _ENCODING_RETRY_SECONDS:
+        return None
+
+    try:
+        _encoding = tiktoken.encoding_for_model(get_settings().openai_model)
+    except KeyError:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # BPE files are downloaded on first use; estimate until that succeeds
+        warning(f"Tokenizer unavailable, estimating token counts: {e}")
+        _encoding_failed_at = time.monotonic()
+    return _encoding
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Count the tokens of a message, cached since history is resent every turn"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+class SessionMemory:
+    """
+    Rolling-window conversation memory with a running summary
+
+    Only the last ``recent_messages`` messages, up to ``recent_token_budget``
+    tokens, are kept verbatim; older ones are folded into a summary by a
+    cheap model. Client-sent histories are summarized incrementally from the
+    longest already-summarized prefix, and server-side sessions keep just
+    ``(summary, recent messages)``, so each new exchange costs at most one
+    small summarization call.
+    """
+
+    def __init__(
+        self,
+        recent_messages: int = 2,
+        recent_token_budget: int = 800,
+        max_sessions: int = 1000,
+        max_summaries: int = 1024
+    ):
+        self.recent_messages = recent_messages
+        self.recent_token_budget = recent_token_budget
+        self.max_sessions = max_sessions
+        self.max_summaries = max_summaries
+
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._llm = None
+
+    @staticmethod
+    def normalize_history(conversation_history: Optional[list]) -> List[str]:
+        """
+        Convert conversation history into message lines
+
+        Accepts both ``{"role", "content"}`` messages and
+        ``{"question", "answer"}`` exchanges.
+        """
+        lines = []
+        for message in conversation_history or []:
+            if not isinstance(message, dict):
+                continue
+
+            if "content" in message:
+                role_name = "User" if message.get("role") == "user" else "Assistant"
+                lines.append(f"{role_name}: {message['content']}")
+            else:
+                if message.get("question"):
+                    lines.append(f"User: {message['question']}")
+                if message.get("answer"):
+                    lines.append(f"Assistant: {message['answer']}")
+
+        return lines
+
+    def history_key(
+        self,
+        conversation_history: Optional[list] = None,
+        session_id: Optional[str] = None
+    ) -> str:
+        """
+        Identify the conversation so far without summarizing it
+
+        Deterministic and free of model calls, so answers can be cached per
+        conversation before ``build_context`` is needed.
+        """
+        if session_id and session_id in self._sessions:
+            session = self._sessions[session_id]
+            lines = [session["summary"], *session["pending"], *session["recent"]]
+        else:
+            lines = self.normalize_history(conversation_history)
+
+        return "\n".join(line for line in lines if line)
+
+    def open_session(self, session_id: Optional[str], conversation_history: Optional[list]):
+        """
+        Start a server-side session from client-sent history
+
+        Messages outside the recent window are left pending, to be summarized
+        on the session's first ``build_context``.
+        """
+        if not session_id or session_id in self._sessions:
+            return
+
+        lines = self.normalize_history(conversation_history)
+        if lines:
+            split = self._window_start(lines)
+            self._new_session(session_id, "", lines[split:])["pending"] = lines[:split]
+
+    async def build_context(
+        self,
+        conversation_history: Optional[list] = None,
+        session_id: Optional[str] = None
+    ) -> str:
+        """
+        Build the conversation context for the next question
+
+        Args:
+            conversation_history: Messages sent by the client
+            session_id: Server-side session to read history from; takes
+                precedence over ``conversation_history`` once it exists
+
+        Returns:
+            Context with the running summary and recent messages, or "" if
+            there is no history
+        """
+        if session_id and session_id in self._sessions:
+            return await self._session_context(session_id)
+
+        lines = self.normalize_history(conversation_history)
+        split = self._window_start(lines)
+        summary = await self._summarize(lines[:split]) if split else ""
+        recent = lines[split:]
+        context = self._format_context(summary, recent)
+
+        if session_id and lines:
+            self._new_session(session_id, summary, recent)["context"] = context
+
+        return context
+
+    @staticmethod
+    def _format_context(summary: str, recent: Sequence[str]) -> str:
+        """Format the running summary and recent messages as context"""
+        if not recent and not summary:
+            return ""
+
+        parts = []
+        if summary:
+            parts.append(f"Summary so far: {summary}")
+        if recent:
+            parts.append("Recent:\n" + "\n".join(recent))
+
+        return "\n".join(parts)
+
+    def add_exchange(self, session_id: Optional[str], question: str, answer: str):
+        """Record a question/answer exchange in a server-side session"""
+        if not session_id:
+            return
+
+        session = self._sessions.get(session_id) or self._new_session(session_id, "", [])
+        session["recent"].extend((f"User: {question}", f"Assistant: {answer}"))
+        session["context"] = None
+
+        # Messages falling out of the window are summarized on the next read
+        recent = session["recent"]
+        while recent and self._window_start(recent) > 0:
+            session["pending"].append(recent.popleft())
+
+    def _window_start(self, lines: Sequence[str]) -> int:
+        """Index of the oldest message that fits in the verbatim window"""
+        start, tokens = len(lines), 0
+        while start > 0 and len(lines) - start < self.recent_messages:
+            tokens += count_tokens(lines[start - 1])
+            if tokens > self.recent_token_budget:
+                break
+            start -= 1
+        return start
+
+    def clear(self):
+        """Forget all sessions and cached summaries"""
+        self._sessions.clear()
+        self._summaries.clear()
+
+    def _new_session(self, session_id: str, summary: str, recent: List[str]) -> Dict[str, Any]:
+        """Create a session, evicting the least recently used one if full"""
+        if len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+
+        self._sessions[session_id] = {
+            "summary": summary,
+            "recent": deque(recent),
+            "pending": [],
+            # Formatted context, reused until the session changes
+            "context": None
+        }
+        return self._sessions[session_id]
+
+    async def _session_context(self, session_id: str) -> str:
+        """Fold pending messages into the session summary and return its context"""
+        self._sessions.move_to_end(session_id)
+        session = self._sessions[session_id]
+
+        if session["pending"]:
+            pending = session["pending"]
+            session["pending"] = []
+            try:
+                session["summary"] = await self._generate_summary(session["summary"], pending)
+            except Exception as e:
+                warning(f"Failed to summarize conversation history: {e}")
+                session["pending"] = pending + session["pending"]
+            session["context"] = None
+
+        if session["context"] is None:
+            session["context"] = self._format_context(session["summary"], session["recent"])
+
+        return session["context"]
+
+    async def _summarize(self, lines: List[str]) -> str:
+        """Summarize message lines, reusing the longest cached prefix summary"""
+        # Hash every prefix so a summary of lines[:i] can be extended incrementally
+        prefix_keys = []
+        digest = hashlib.blake2b(digest_size=16)
+        for line in lines:
+            digest.update(line.encode("utf-8"))
+            digest.update(b"\0")
+            prefix_keys.append(digest.hexdigest())
+
+        cached_upto, summary = 0, ""
+        for i in range(len(prefix_keys) - 1, -1, -1):
+            if prefix_keys[i] in self._summaries:
+                cached_upto, summary = i + 1, self._summaries[prefix_keys[i]]
+                self._summaries.move_to_end(prefix_keys[i])
+                break
+
+        if cached_upto == len(lines):
+            return summary
+
+        try:
+            summary = await self._generate_summary(summary, lines[cached_upto:])
+        except Exception as e:
+            warning(f"Failed to summarize conversation history: {e}")
+            return summary
+
+        self._summaries[prefix_keys[-1]] = summary
+        if len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+
+        return summary
+
+    async def _generate_summary(self, summary: str, lines: List[str]) -> str:
+        """Call the summary model to fold new messages into the summary"""
+        settings = get_settings()
+
+        if self._llm is None:
+            from langchain_openai import ChatOpenAI
+
+            self._llm = ChatOpenAI(
+                model=settings.memory_summary_model,
+                temperature=0,
+                max_tokens=settings.memory_summary_max_tokens,
+                openai_api_key=settings.openai_api_key,
+                request_timeout=settings.openai_timeout
+            )
+
+        prompt = SUMMARY_PROMPT.format(
+            summary=f"Previous summary: {summary}\n\n" if summary else "",
+            messages="\n".join(lines)
+        )
+        response = await self._llm.ainvoke(prompt)
+        return response.content.strip()
@@ -9,15 +9,18 @@ import asyncio
 from contextlib import asynccontextmanager
 from typing import Dict, Any, List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+import orjson
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, constr, field_validator
 
-from ..core.config import settings
+from ..core.config import get_settings
 from ..agents.query_processor import get_processor
-from ..agents.langchain_agent import cleanup_agent
+from ..agents.langchain_agent import cleanup_agent, get_agent_status
 from ..utils.logging import setup_logging, get_logger, success, warning, error
+from ..utils.metrics import setup_metrics
 
 
 # Setup logging
@@ -27,12 +30,47 @@ logger = get_logger(__name__)
 # Request/Response Models
 class QueryRequest(BaseModel):
     """Request model for query processing"""
+    # Extra fields the frontend sends (e.g. language) are ignored, not rejected
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True, frozen=True)
+    
     question: str = Field(..., description="Natural language question", min_length=1)
     context: str = Field(default="", description="Additional context for the query")
     conversation_history: Optional[List[Dict[str, str]]] = Field(
         default=None, 
         description="Previous conversation history"
     )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Conversation session kept server-side, so history need not be resent"
+    )
+    include_steps: bool = Field(
+        default=False,
+        description="Return the agent's tool calls in intermediate_steps"
+    )
+
+class QueryBatchRequest(BaseModel):
+    """Request model for batch query processing"""
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True, frozen=True)
+    
+    questions: List[constr(min_length=1)] = Field(
+        ...,
+        description="Independent natural language questions",
+        min_length=1
+    )
+    context: str = Field(default="", description="Additional context shared by every question")
+    include_steps: bool = Field(
+        default=False,
+        description="Return the agent's tool calls in intermediate_steps"
+    )
+    
+    @field_validator("questions")
+    @classmethod
+    def limit_batch_size(cls, questions: List[str]) -> List[str]:
+        """Reject batches over QUERY_BATCH_MAX_SIZE, read when a request arrives"""
+        max_size = get_settings().query_batch_max_size
+        if len(questions) > max_size:
+            raise ValueError(f"At most {max_size} questions are allowed per batch")
+        return questions
 
 class QueryResponse(BaseModel):
     """Response model for query processing"""
@@ -49,6 +87,17 @@ class QueryResponse(BaseModel):
     model: str
     error: Optional[str] = None
 
+class QueryBatchResponse(BaseModel):
+    """Response model for batch query processing"""
+    results: List[QueryResponse]
+
+class HealthResponse(BaseModel):
+    """Response model for health checks"""
+    status: str
+    database_connected: bool
+    openai_connected: bool
+    agent_ready: bool
+
 class StatusResponse(BaseModel):
     """Response model for system status"""
     status: str
@@ -60,17 +109,69 @@ class StatusResponse(BaseModel):
 class CacheStatsResponse(BaseModel):
     """Response model for cache statistics"""
     cache_enabled: bool
-    size: Optional[int] = None
+    total_entries: Optional[int] = None
+    valid_entries: Optional[int] = None
+    expired_entries: Optional[int] = None
     max_size: Optional[int] = None
-    hit_count: Optional[int] = None
-    miss_count: Optional[int] = None
-    hit_rate: Optional[float] = None
+    ttl_seconds: Optional[int] = None
+    disk_entries: Optional[int] = None
+    semantic_cache: Optional[Dict[str, Any]] = None
+
+
+def build_health_payload() -> bytes:
+    """
+    Build the encoded /health response from the agent's current status
+    
+    Returns:
+        JSON payload, served as is until the next refresh
+    """
+    agent_status = get_agent_status()
+    health = {
+        "database_connected": agent_status["database_connected"],
+        "openai_connected": agent_status["llm_model"] is not None,
+        "agent_ready": agent_status["is_initialized"]
+    }
+    health["status"] = "healthy" if all(health.values()) else "unhealthy"
+    return orjson.dumps(HealthResponse(**health).model_dump())
+
+
+def build_config_payload() -> bytes:
+    """
+    Build the encoded /config response
+    
+    Built at startup rather than import, so settings changed by the
+    launcher (e.g. ``run.py --debug``) are reflected.
+    
+    Returns:
+        JSON payload, served as is for the life of the process
+    """
+    settings = get_settings()
+    return orjson.dumps({
+        "api_version": settings.api_version,
+        "openai_model": settings.openai_model,
+        "cache_enabled": settings.cache_enabled,
+        "validation_enabled": settings.validation_enabled,
+        "precompiled_queries_enabled": settings.enable_precompiled_queries,
+        "debug": settings.debug
+    })
+
+
+async def refresh_health_periodically(app: FastAPI):
+    """Rebuild the /health payload in the background"""
+    while True:
+        await asyncio.sleep(get_settings().health_refresh_seconds)
+        try:
+            app.state.health_payload = build_health_payload()
+        except Exception as e:
+            warning(f"Failed to refresh health status: {e}")
 
 
 # Application lifespan management
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application startup and shutdown"""
+    settings = get_settings()
+    
     # Startup
     success("🚀 AUQ NLP API starting up...")
     
@@ -79,12 +180,29 @@ async def lifespan(app: FastAPI):
     
     # Initialize processor (which will initialize agent)
     processor = get_processor()
+    processor.load_semantic_cache()
+    
+    # Keep agent and embedding model setup off the first request
+    if settings.prewarm_on_startup:
+        if await processor.warm_up():
+            success("Agent and embeddings prewarmed")
+        else:
+            warning("Prewarm incomplete, failed components are retried on first query")
+    
+    # Health probes are answered from this payload, so they do no work
+    app.state.health_payload = build_health_payload()
+    app.state.config_payload = build_config_payload()
+    health_task = asyncio.ensure_future(refresh_health_periodically(app))
     success("✅ Application startup complete!")
     
     yield
     
     # Shutdown
     warning("🛑 AUQ NLP API shutting down...")
+    health_task.cancel()
+    processor.save_semantic_cache()
+    if processor.cache:
+        processor.cache.close()
     await cleanup_agent()
     success("✅ Application shutdown complete!")
 
@@ -97,12 +215,15 @@ def create_app() -> FastAPI:
     Returns:
         Configured FastAPI application
     """
+    settings = get_settings()
+    
     app = FastAPI(
         title=settings.api_title,
         description=settings.api_description,
         version=settings.api_version,
         debug=settings.debug,
-        lifespan=lifespan
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
     )
     
     # Add CORS middleware
@@ -111,6 +232,16 @@ def create_app() -> FastAPI:
         **settings.get_cors_config()
     )
     
+    # Compress larger JSON responses; event streams are left uncompressed
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.gzip_minimum_size,
+        compresslevel=settings.gzip_compresslevel
+    )
+    
+    # Expose Prometheus metrics at /metrics
+    setup_metrics(app)
+    
     # Add exception handlers
     add_exception_handlers(app)
     
@@ -127,7 +258,7 @@ def add_exception_handlers(app: FastAPI):
     async def http_exception_handler(request, exc):
         """Handle HTTP exceptions"""
         error(f"HTTP {exc.status_code}: {exc.detail}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 "success": False,
@@ -140,7 +271,7 @@ def add_exception_handlers(app: FastAPI):
     async def general_exception_handler(request, exc):
         """Handle general exceptions"""
         error(f"Unhandled exception: {exc}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "success": False,
@@ -152,19 +283,57 @@ def add_exception_handlers(app: FastAPI):
 
 def add_routes(app: FastAPI):
     """Add all API routes"""
+    settings = get_settings()
+    
+    # Bodies that only depend on settings are encoded once, here
+    root_body = orjson.dumps({
+        "message": "AUQ NLP API is running!",
+        "version": settings.api_version,
+        "status": "healthy"
+    })
+    status_body = orjson.dumps({
+        "status": "healthy",
+        "version": settings.api_version,
+        "uptime_seconds": 0.0,
+        "processor_status": {
+            "cache_enabled": settings.cache_enabled,
+            "validation_enabled": settings.validation_enabled,
+            "precompiled_queries_enabled": settings.enable_precompiled_queries,
+            "precompiled_queries_count": 3,
+            "openai_model": settings.openai_model
+        },
+        "agent_status": {
+            "is_initialized": True,
+            "database_connected": True, 
+            "agent_ready": True,
+            "llm_model": settings.openai_model
+        }
+    })
+    test_body = orjson.dumps({"message": "Test endpoint working!"})
     
     # Health check endpoint
     @app.get("/")
     async def root():
         """Root endpoint - health check"""
-        return {
-            "message": "AUQ NLP API is running!",
-            "version": settings.api_version,
-            "status": "healthy"
-        }
+        return Response(root_body, media_type="application/json")
+    
+    @app.get("/health", response_model=None, responses={200: {"model": HealthResponse}})
+    async def health_check(request: Request):
+        """
+        Check API and dependencies status
+        
+        Served from a payload built at startup and refreshed every
+        ``HEALTH_REFRESH_SECONDS``, so probes cost no work.
+        
+        Returns:
+            Health status of the database, OpenAI and agent
+        """
+        return Response(request.app.state.health_payload, media_type="application/json")
     
     # Main query endpoint
-    @app.post("/query", response_model=QueryResponse)
+    # The processor builds the response dict itself, so it is serialized as is;
+    # QueryResponse only documents the schema
+    @app.post("/query", response_model=None, responses={200: {"model": QueryResponse}})
     async def process_query(request: QueryRequest):
         """
         Process a natural language query
@@ -181,10 +350,12 @@ def add_routes(app: FastAPI):
             result = await processor.process_query(
                 question=request.question,
                 context=request.context,
-                conversation_history=request.conversation_history
+                conversation_history=request.conversation_history,
+                session_id=request.session_id,
+                include_steps=request.include_steps
             )
             
-            return QueryResponse(**result)
+            return ORJSONResponse(result)
             
         except Exception as e:
             error(f"Error processing query: {e}")
@@ -193,6 +364,75 @@ def add_routes(app: FastAPI):
                 detail=f"Query processing failed: {str(e)}"
             )
     
+    # Batch query endpoint
+    @app.post("/query/batch", response_model=None, responses={200: {"model": QueryBatchResponse}})
+    async def process_query_batch(request: QueryBatchRequest):
+        """
+        Process independent natural language queries concurrently
+        
+        One request replaces a round trip per question; results keep the order
+        of the submitted questions.
+        
+        Args:
+            request: Batch request with the questions and shared context
+            
+        Returns:
+            Query responses, one per question
+        """
+        try:
+            processor = get_processor()
+            
+            results = await asyncio.gather(*(
+                processor.process_query(
+                    question=question,
+                    context=request.context,
+                    include_steps=request.include_steps
+                )
+                for question in request.questions
+            ))
+            
+            return ORJSONResponse({"results": results})
+            
+        except Exception as e:
+            error(f"Error processing query batch: {e}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Batch query processing failed: {str(e)}"
+            )
+    
+    # Streaming query endpoint
+    @app.post("/query/stream")
+    async def stream_query(request: QueryRequest):
+        """
+        Process a natural language query, streaming the answer as Server-Sent Events
+        
+        Each event is a JSON object: ``token`` events carry answer fragments and
+        the final ``done`` (or ``error``) event carries the full response payload.
+        
+        Args:
+            request: Query request with question, context, and history
+            
+        Returns:
+            Event stream with the answer tokens and response metadata
+        """
+        processor = get_processor()
+        
+        async def event_generator():
+            async for event in processor.stream_query(
+                question=request.question,
+                context=request.context,
+                conversation_history=request.conversation_history,
+                session_id=request.session_id
+            ):
+                # Frames are emitted as bytes, skipping a str round trip per token
+                yield b"data: " + orjson.dumps(event, default=str) + b"\n\n"
+        
+        return StreamingResponse(
+            event_generator(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
     # System status endpoint
     @app.get("/status")
     async def get_status():
@@ -202,27 +442,11 @@ def add_routes(app: FastAPI):
         Returns:
             System status with component health
         """
-        return {
-            "status": "healthy",
-            "version": settings.api_version,
-            "uptime_seconds": 0.0,
-            "processor_status": {
-                "cache_enabled": settings.cache_enabled,
-                "validation_enabled": settings.validation_enabled,
-                "precompiled_queries_enabled": settings.enable_precompiled_queries,
-                "precompiled_queries_count": 3,
-                "openai_model": settings.openai_model
-            },
-            "agent_status": {
-                "is_initialized": True,
-                "database_connected": True, 
-                "agent_ready": True,
-                "llm_model": settings.openai_model
-            }
-        }
+        return Response(status_body, media_type="application/json")
     
     # Cache management endpoints
-    @app.get("/cache/stats", response_model=CacheStatsResponse)
+    # Like /query, the stats dict is serialized as is; CacheStatsResponse documents it
+    @app.get("/cache/stats", response_model=None, responses={200: {"model": CacheStatsResponse}})
     async def get_cache_stats():
         """
         Get cache statistics
@@ -234,7 +458,7 @@ def add_routes(app: FastAPI):
             processor = get_processor()
             stats = processor.get_cache_stats()
             
-            return CacheStatsResponse(**stats)
+            return ORJSONResponse(stats)
             
         except Exception as e:
             error(f"Error getting cache stats: {e}")
@@ -293,25 +517,18 @@ def add_routes(app: FastAPI):
     @app.get("/test")
     async def test_endpoint():
         """Simple test endpoint"""
-        return {"message": "Test endpoint working!"}
+        return Response(test_body, media_type="application/json")
 
     # Configuration endpoint
     @app.get("/config")
-    async def get_config():
+    async def get_config(request: Request):
         """
         Get public configuration information
         
         Returns:
             Public configuration settings
         """
-        return {
-            "api_version": settings.api_version,
-            "openai_model": settings.openai_model,
-            "cache_enabled": settings.cache_enabled,
-            "validation_enabled": settings.validation_enabled,
-            "precompiled_queries_enabled": settings.enable_precompiled_queries,
-            "debug": settings.debug
-        }
+        return Response(request.app.state.config_payload, media_type="application/json")
 
 
 # Create the application instance
@@ -327,6 +544,7 @@ async def startup_event():
 if __name__ == "__main__":
     import uvicorn
     
+    settings = get_settings()
     uvicorn.run(
         "src.auq_nlp.api.main:app",
         host=settings.host,
@@ -5,13 +5,31 @@ Contains the fundamental components: configuration, caching, validation,
 and shared utilities for the natural language processing system.
 """
 
-from .config import settings
-from .cache import QueryCache, PrecompiledQueries
-# from .validator import ResultValidator  # Temporarily disabled to avoid circular import
+import importlib
+
+# Imported on first use (PEP 562), so importing the config does not load numpy
+_LAZY_IMPORTS = {
+    "settings": ".config",
+    "get_settings": ".config",
+    "QueryCache": ".cache",
+    "PrecompiledQueries": ".cache",
+    "SemanticCache": ".semantic_cache",
+    # "ResultValidator": ".validator",  # Temporarily disabled to avoid circular import
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "settings",
+    "get_settings",
     "QueryCache",
     "PrecompiledQueries", 
+    "SemanticCache",
     # "ResultValidator",
 ] 
\ No newline at end of file
@@ -11,89 +11,277 @@ Version: 1.0.0
 
 import hashlib
 import json
+import sqlite3
+import string
+import textwrap
+import threading
 import time
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, List, Sequence, Tuple
 from functools import lru_cache
 import os
 
+from ..utils.logging import warning
+
+try:
+    import ahocorasick
+except ImportError:  # Optional speedup, falls back to a substring scan
+    ahocorasick = None
+
+
+class _SQLiteStore:
+    """
+    SQLite table of cached responses, shared by processes using the same file
+    
+    Entries expire by wall clock time, since monotonic clocks are not
+    comparable across processes or restarts. Expired and surplus entries are
+    pruned every ``prune_interval`` writes rather than on each one, so the
+    table can briefly hold up to that many entries over ``max_size``.
+    """
+    
+    def __init__(self, path: Path, max_size: int, ttl_seconds: int, prune_interval: int = 100):
+        self.path = path
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.prune_interval = max(1, prune_interval)
+        self._writes = 0
+        # One connection is shared by the threads reading and writing through it
+        self._lock = threading.Lock()
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False)
+        # WAL lets workers read while another one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_cache "
+            "(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS query_cache_expires ON query_cache (expires)"
+        )
+        self._conn.commit()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get an unexpired response by key"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM query_cache WHERE key = ? AND expires > ?",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def set(self, key: str, response: Any):
+        """Store a response, pruning the table every ``prune_interval`` writes"""
+        payload = json.dumps(response, default=str)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_cache (key, response, expires) VALUES (?, ?, ?)",
+                (key, payload, now + self.ttl_seconds)
+            )
+            self._writes += 1
+            if self._writes % self.prune_interval == 0:
+                self._prune(now)
+    
+    def _prune(self, now: float):
+        """Drop expired and surplus entries, caller holds the lock"""
+        self._conn.execute("DELETE FROM query_cache WHERE expires <= ?", (now,))
+        # Entries share one TTL, so the soonest to expire are the oldest
+        self._conn.execute(
+            "DELETE FROM query_cache WHERE key IN ("
+            "SELECT key FROM query_cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,)
+        )
+    
+    def clear(self):
+        """Remove all entries"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM query_cache")
+    
+    def count(self) -> int:
+        """Number of unexpired entries"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM query_cache WHERE expires > ?", (time.time(),)
+            ).fetchone()
+        return row[0]
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
 
 class QueryCache:
-    """Simple in-memory cache with TTL support"""
+    """
+    Simple in-memory LRU cache with TTL support
+    
+    Safe to use from worker threads: hashing in ``make_key`` needs no lock,
+    and the short dict updates are guarded by one.
+    
+    Given a ``path``, entries are also written to a SQLite file that acts as
+    a second level shared by uvicorn workers and kept across restarts. The
+    in-memory lock is never held during SQLite I/O, and async callers can
+    pass ``disk=False`` and reach the file with ``load`` and ``persist``
+    from a worker thread instead.
+    """
     
-    def __init__(self, max_size: int = 1000, ttl_seconds: int = 3600):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl_seconds: int = 3600,
+        path: Optional[Path] = None,
+        disk_max_size: Optional[int] = None
+    ):
+        # Kept in LRU order: least recently used first
+        self.cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self.max_size = max_size
         self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._disk = (
+            _SQLiteStore(Path(path), disk_max_size or max_size, ttl_seconds)
+            if path else None
+        )
     
-    def _generate_key(self, question: str, context: str = "") -> str:
-        """Generate cache key from question and context"""
-        content = f"{question.lower().strip()}|{context}"
-        return hashlib.md5(content.encode()).hexdigest()
+    @staticmethod
+    def make_key(question: str, context: str = "") -> str:
+        """
+        Generate cache key from question and context
+        
+        Questions differing only in case or whitespace share a key. Callers
+        doing a get and then a set for the same question can compute the key
+        once and pass it to both.
+        """
+        # BLAKE2b is faster than MD5; parts are fed separately to avoid a joined copy
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(" ".join(question.casefold().split()).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(context.encode("utf-8"))
+        return digest.hexdigest()
+    
+    @property
+    def disk_enabled(self) -> bool:
+        """Whether entries are also kept in a SQLite file"""
+        return self._disk is not None
     
     def _is_expired(self, cache_entry: Dict[str, Any]) -> bool:
         """Check if cache entry is expired"""
-        return time.time() - cache_entry["timestamp"] > self.ttl_seconds
+        return time.monotonic() - cache_entry["timestamp"] > self.ttl_seconds
     
-    def get(self, question: str, context: str = "") -> Optional[Dict[str, Any]]:
-        """Get cached response for a question"""
-        key = self._generate_key(question, context)
-        
-        if key not in self.cache:
-            return None
+    def get(
+        self,
+        question: str,
+        context: str = "",
+        key: Optional[str] = None,
+        disk: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """Get cached response for a question, by precomputed key if given"""
+        key = key or self.make_key(question, context)
         
-        entry = self.cache[key]
-        if self._is_expired(entry):
-            del self.cache[key]
-            return None
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None and self._is_expired(entry):
+                del self.cache[key]
+                entry = None
+            
+            if entry is not None:
+                self.cache.move_to_end(key)
+                return entry["response"]
         
-        # Update access time for LRU
-        entry["last_accessed"] = time.time()
-        return entry["response"]
+        return self.load(question, key) if disk else None
     
-    def set(self, question: str, response: Dict[str, Any], context: str = ""):
-        """Cache a response for a question"""
-        key = self._generate_key(question, context)
+    def set(
+        self,
+        question: str,
+        response: Dict[str, Any],
+        context: str = "",
+        key: Optional[str] = None,
+        disk: bool = True
+    ):
+        """Cache a response for a question, by precomputed key if given"""
+        key = key or self.make_key(question, context)
         
-        # Implement simple LRU eviction
-        if len(self.cache) >= self.max_size:
-            self._evict_oldest()
+        with self._lock:
+            self._store(key, question, response)
         
-        self.cache[key] = {
+        if disk:
+            self.persist(key, response)
+    
+    def load(self, question: str, key: str) -> Optional[Any]:
+        """Read an entry from the SQLite file into memory, None if absent"""
+        store = self._disk
+        if store is None:
+            return None
+        
+        # Another worker, or a previous run, may have answered it
+        response = store.get(key)
+        if response is not None:
+            with self._lock:
+                self._store(key, question, response)
+        return response
+    
+    def persist(self, key: str, response: Any):
+        """Write an entry to the SQLite file, if any"""
+        store = self._disk
+        if store is not None:
+            store.set(key, response)
+    
+    def _store(self, key: str, question: str, response: Any):
+        """Insert an entry in the in-memory LRU, caller holds the lock"""
+        # Monotonic clock, so wall clock adjustments don't expire or revive entries
+        entry = {
             "response": response,
-            "timestamp": time.time(),
-            "last_accessed": time.time(),
+            "timestamp": time.monotonic(),
             "question": question
         }
-    
-    def _evict_oldest(self):
-        """Evict the least recently used entry"""
-        if not self.cache:
-            return
         
-        oldest_key = min(
-            self.cache.keys(),
-            key=lambda k: self.cache[k]["last_accessed"]
-        )
-        del self.cache[oldest_key]
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        elif len(self.cache) >= self.max_size:
+            # Evict the least recently used entry
+            self.cache.popitem(last=False)
+        
+        self.cache[key] = entry
     
     def clear(self):
         """Clear all cached entries"""
-        self.cache.clear()
+        with self._lock:
+            self.cache.clear()
+        
+        if self._disk is not None:
+            self._disk.clear()
+    
+    def close(self):
+        """Release the SQLite connection, if any"""
+        store, self._disk = self._disk, None
+        if store is not None:
+            store.close()
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
+        with self._lock:
+            entries = list(self.cache.values())
+        
+        store = self._disk
+        disk_entries = store.count() if store is not None else None
+        
         valid_entries = sum(
-            1 for entry in self.cache.values()
+            1 for entry in entries
             if not self._is_expired(entry)
         )
         
-        return {
-            "total_entries": len(self.cache),
+        stats = {
+            "total_entries": len(entries),
             "valid_entries": valid_entries,
-            "expired_entries": len(self.cache) - valid_entries,
+            "expired_entries": len(entries) - valid_entries,
             "max_size": self.max_size,
             "ttl_seconds": self.ttl_seconds
         }
+        if disk_entries is not None:
+            stats["disk_entries"] = disk_entries
+        return stats
 
 
 class PrecompiledQueries:
@@ -117,7 +305,9 @@ class PrecompiledQueries:
                 ORDER BY i.year DESC
                 LIMIT 1
             """,
-            "response_template": "The population of Barcelona is {value:,.0f} inhabitants."
+            "response_template": "The population of Barcelona is {value:,.0f} inhabitants.",
+            # Result column that fills the template field
+            "value_column": 1
         },
         
         "districts_count": {
@@ -131,7 +321,8 @@ class PrecompiledQueries:
                 FROM geographical_unit_view
                 WHERE geo_level_id = 2 AND city_id = 1
             """,
-            "response_template": "Barcelona has {district_count} districts."
+            "response_template": "Barcelona has {district_count} districts.",
+            "value_column": 0
         },
         
         "population_by_district": {
@@ -153,50 +344,118 @@ class PrecompiledQueries:
         }
     }
     
+    # Pattern matchers, built once at import time: an Aho-Corasick automaton
+    # when available, else a flat (pattern, character mask, query) table
+    _AUTOMATON = None
+    _PATTERNS: List[Tuple[str, int, Dict[str, Any]]] = []
+    
+    # Response formatters, compiled once per template at import time
+    _FORMATTERS: Dict[str, Callable[[Sequence[Sequence[Any]]], str]] = {}
+    
+    @staticmethod
+    def _char_mask(text: str) -> int:
+        """64-bit bitmap of the characters in a string, folded modulo 64"""
+        mask = 0
+        for char in text:
+            mask |= 1 << (ord(char) & 63)
+        return mask
+    
+    @classmethod
+    def _compile_queries(cls):
+        """Dedent the SQL and lowercase the patterns of every query, once"""
+        for query_info in cls.COMMON_QUERIES.values():
+            query_info["sql"] = textwrap.dedent(query_info["sql"]).strip()
+            query_info["patterns"] = tuple(pattern.lower() for pattern in query_info["patterns"])
+    
+    @classmethod
+    def _build_matchers(cls):
+        """Build the pattern matchers for every query pattern"""
+        cls._PATTERNS = [
+            (pattern, cls._char_mask(pattern), query_info)
+            for query_info in cls.COMMON_QUERIES.values()
+            for pattern in query_info["patterns"]
+        ]
+        
+        if ahocorasick is None:
+            cls._AUTOMATON = None
+            return
+        
+        automaton = ahocorasick.Automaton()
+        for order, query_info in enumerate(cls.COMMON_QUERIES.values()):
+            for pattern in query_info["patterns"]:
+                # A pattern shared by several queries belongs to the first one
+                if pattern not in automaton:
+                    automaton.add_word(pattern, (order, query_info))
+        automaton.make_automaton()
+        cls._AUTOMATON = automaton
+    
+    @staticmethod
+    def _format_row(row: Sequence[Any]) -> str:
+        """Format a (name, value) row as a bullet point"""
+        if isinstance(row[1], (int, float)):
+            return f"• {row[0]}: {row[1]:,.0f}"
+        return f"• {row[0]}: {row[1]}"
+    
+    @classmethod
+    def _compile_formatter(cls, query_info: Dict[str, Any]) -> Callable[[Sequence[Sequence[Any]]], str]:
+        """Build the formatter that renders a query's result rows with its template"""
+        template = query_info["response_template"]
+        render = template.format
+        
+        if "{formatted_results}" in template:
+            format_row = cls._format_row
+            
+            def format_rows(results: Sequence[Sequence[Any]]) -> str:
+                # Limit to top 10
+                return render(formatted_results="\\n".join(map(format_row, results[:10])))
+            
+            return format_rows
+        
+        field = next(name for _, name, _, _ in string.Formatter().parse(template) if name)
+        column = query_info["value_column"]
+        return lambda results: render(**{field: results[0][column]})
+    
+    @classmethod
+    def _build_formatters(cls):
+        """Compile the response formatter of every query"""
+        for query_info in cls.COMMON_QUERIES.values():
+            query_info["formatter"] = cls._compile_formatter(query_info)
+        cls._FORMATTERS = {
+            query_info["response_template"]: query_info["formatter"]
+            for query_info in cls.COMMON_QUERIES.values()
+        }
+    
     @classmethod
     def find_matching_query(cls, question: str) -> Optional[Dict[str, Any]]:
         """Find a pre-compiled query that matches the question"""
         question_lower = question.lower().strip()
         
-        for query_info in cls.COMMON_QUERIES.values():
-            for pattern in query_info["patterns"]:
-                if pattern in question_lower:
-                    return query_info
+        if cls._AUTOMATON is not None:
+            # One pass over the question; ties go to the first declared query
+            matches = [match for _, match in cls._AUTOMATON.iter(question_lower)]
+            return min(matches, key=lambda match: match[0])[1] if matches else None
+        
+        # A pattern can only occur if all its characters occur in the question
+        question_mask = cls._char_mask(question_lower)
+        for pattern, mask, query_info in cls._PATTERNS:
+            if mask & question_mask == mask and pattern in question_lower:
+                return query_info
         
         return None
     
     @classmethod
-    def format_response(cls, template: str, results: Any) -> str:
-        """Format the response using the template and results"""
-        try:
-            if isinstance(results, list) and len(results) > 0:
-                if "formatted_results" in template:
-                    # Format list results
-                    formatted = "\\n".join([
-                        f"• {row[0]}: {row[1]:,.0f}" if isinstance(row[1], (int, float))
-                        else f"• {row[0]}: {row[1]}"
-                        for row in results[:10]  # Limit to top 10
-                    ])
-                    return template.format(formatted_results=formatted)
-                elif len(results[0]) > 1:
-                    # Single result with multiple columns
-                    result_dict = dict(zip(
-                        ["name", "value", "district_count"],
-                        results[0]
-                    ))
-                    return template.format(**result_dict)
-            
-            # Single value result
-            if isinstance(results, (int, float)):
-                return template.format(value=results)
-            elif isinstance(results, list) and len(results) > 0:
-                return template.format(value=results[0][0])
-            
-        except (KeyError, IndexError, TypeError) as e:
-            print(f"Error formatting response: {e}")
+    def format_response(cls, template: str, results: Sequence[Sequence[Any]]) -> str:
+        """Format result rows with the formatter compiled for a query template"""
+        formatter = cls._FORMATTERS.get(template)
+        if formatter is None or not results:
             return f"Results: {results}"
         
-        return f"Results: {results}"
+        try:
+            return formatter(results)
+        except (IndexError, TypeError, ValueError) as e:
+            # Rows shaped differently from what the query's template expects
+            warning(f"Could not format precompiled results: {e}")
+            return f"Results: {results}"
     
     @classmethod
     def get_response(cls, question: str) -> Optional[Dict[str, Any]]:
@@ -206,10 +465,12 @@ class PrecompiledQueries:
             return {
                 "sql": matching_query["sql"],
                 "template": matching_query["response_template"],
+                "formatter": matching_query["formatter"],
                 "found": True
             }
         return None
 
 
-# Global cache instance
-query_cache = QueryCache(max_size=1000, ttl_seconds=3600)  # 1 hour TTL 
\ No newline at end of file
+PrecompiledQueries._compile_queries()
+PrecompiledQueries._build_matchers()
+PrecompiledQueries._build_formatters()
@@ -5,125 +5,243 @@ Centralized configuration using Pydantic settings with environment variable supp
 """
 
 import os
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import List, Optional
-from pydantic import Field
-from pydantic_settings import BaseSettings
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+from pydantic import PrivateAttr
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+# Resolved once at import, the source tree does not move at runtime
+_BASE_DIR = Path(__file__).resolve().parents[3]
+_PROMPT_DIR = _BASE_DIR / "config" / "prompts"
+_DOCS_DIR = _BASE_DIR / "docs"
 
 
 class Settings(BaseSettings):
-    """Application settings with environment variable support"""
+    """
+    Application settings with environment variable support
+    
+    Each field is read from the environment variable of the same name,
+    matched case-insensitively (e.g. ``OPENAI_MODEL`` for ``openai_model``).
+    """
+    
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        extra="ignore"  # Ignore extra environment variables
+    )
     
     # API Configuration
     api_title: str = "AUQ NLP API"
     api_description: str = "Natural Language Processing API for Urban Analytics Queries"
     api_version: str = "2.0.0"
-    debug: bool = Field(default=False, env="DEBUG")
+    debug: bool = False
     
     # Server Configuration
-    host: str = Field(default="0.0.0.0", env="HOST")
-    port: int = Field(default=8000, env="PORT")
-    reload: bool = Field(default=False, env="RELOAD")
+    host: str = "0.0.0.0"
+    port: int = 8000
+    reload: bool = False
+    workers: int = max(1, os.cpu_count() or 2)  # One per CPU, database pools are capped below
     
     # Database Configuration
-    supabase_uri: str = Field(..., env="SUPABASE_URI")
-    database_timeout: int = Field(default=30, env="DATABASE_TIMEOUT")
+    supabase_uri: str
+    database_timeout: int = 30
+    database_pool_size: int = 20
+    database_max_overflow: int = 20
+    # Shared by all workers, each pool is capped to its share of this total
+    database_max_connections: int = 40
+    database_pool_recycle: int = 1800  # 30 minutes
+    database_sslmode: str = "require"
+    schema_refresh_seconds: int = 600  # 0 disables refresh
     
     # OpenAI Configuration
-    openai_api_key: str = Field(..., env="OPENAI_API_KEY")
-    openai_model: str = Field(default="gpt-4-turbo-preview", env="OPENAI_MODEL")
-    openai_temperature: float = Field(default=0.0, env="OPENAI_TEMPERATURE")
-    openai_max_tokens: int = Field(default=1500, env="OPENAI_MAX_TOKENS")
-    openai_timeout: int = Field(default=60, env="OPENAI_TIMEOUT")
+    openai_api_key: str
+    openai_model: str = "gpt-4o-mini"
+    openai_temperature: float = 0.0
+    openai_max_tokens: int = 512
+    openai_timeout: int = 20
+    # Model used by the SQL toolkit to check generated queries
+    openai_sql_model: str = "gpt-4o-mini"
+    openai_sql_max_tokens: int = 256
+    openai_max_concurrency: int = 8
+    openai_rate_limit_retries: int = 3
+    # "openai-tools" uses native function calling; "zero-shot-react-description" parses ReAct text
+    agent_type: str = "openai-tools"
+    agent_init_retry_seconds: int = 30  # Wait after a failed initialization before retrying
     
     # Cache Configuration
-    cache_enabled: bool = Field(default=True, env="CACHE_ENABLED")
-    cache_max_size: int = Field(default=1000, env="CACHE_MAX_SIZE")
-    cache_ttl_seconds: int = Field(default=3600, env="CACHE_TTL_SECONDS")  # 1 hour
+    cache_enabled: bool = True
+    cache_max_size: int = 1000
+    cache_ttl_seconds: int = 3600  # 1 hour
+    cache_key_offload_bytes: int = 4096  # Hash longer contexts off the event loop
+    cache_file: Optional[str] = None  # SQLite file shared by workers
+    cache_disk_max_size: int = 10000
+    
+    # Semantic Cache Configuration
+    semantic_cache_enabled: bool = True
+    semantic_cache_backend: str = "openai"  # "openai" or "local"
+    semantic_cache_model: str = "text-embedding-3-small"
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_local_model: str = "all-MiniLM-L6-v2"
+    semantic_cache_local_threshold: float = 0.87
+    semantic_cache_max_size: int = 1024
+    semantic_cache_file: Optional[str] = None
     
     # CORS Configuration
-    cors_origins: List[str] = Field(
-        default=["*"],
-        env="CORS_ORIGINS"
-    )
-    cors_allow_credentials: bool = Field(default=False, env="CORS_ALLOW_CREDENTIALS")
-    cors_allow_methods: List[str] = Field(
-        default=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        env="CORS_ALLOW_METHODS"
-    )
-    cors_allow_headers: List[str] = Field(default=["*"], env="CORS_ALLOW_HEADERS")
+    # Tuples, so the defaults are shared instead of copied for every Settings
+    cors_origins: Tuple[str, ...] = ("*",)
+    cors_allow_credentials: bool = False
+    cors_allow_methods: Tuple[str, ...] = ("GET", "POST", "PUT", "DELETE", "OPTIONS")
+    cors_allow_headers: Tuple[str, ...] = ("*",)
+    cors_max_age: int = 86400  # Browsers cache preflights for a day
+    
+    # Metrics Configuration
+    metrics_enabled: bool = True
+    
+    # Compression Configuration
+    gzip_minimum_size: int = 1024  # Bytes
+    gzip_compresslevel: int = 5
     
     # Paths Configuration
-    base_dir: Path = Field(default_factory=lambda: Path(__file__).resolve().parents[3])
-    prompt_dir: Path = Field(default_factory=lambda: Path(__file__).resolve().parents[3] / "config" / "prompts")
-    docs_dir: Path = Field(default_factory=lambda: Path(__file__).resolve().parents[3] / "docs")
+    base_dir: Path = _BASE_DIR
+    prompt_dir: Path = _PROMPT_DIR
+    docs_dir: Path = _DOCS_DIR
     
     # Prompt Configuration
-    enhanced_prompt_file: str = Field(default="enhanced_prompt.txt", env="ENHANCED_PROMPT_FILE")
-    fallback_prompt_file: str = Field(default="custom_prompt.txt", env="FALLBACK_PROMPT_FILE")
+    enhanced_prompt_file: str = "enhanced_prompt.txt"
+    fallback_prompt_file: str = "custom_prompt.txt"
     
     # Validation Configuration
-    validation_enabled: bool = Field(default=True, env="VALIDATION_ENABLED")
-    max_population_city: int = Field(default=2_000_000, env="MAX_POPULATION_CITY")
-    max_population_district: int = Field(default=400_000, env="MAX_POPULATION_DISTRICT")
-    max_population_neighborhood: int = Field(default=80_000, env="MAX_POPULATION_NEIGHBORHOOD")
+    validation_enabled: bool = True
+    max_population_city: int = 2_000_000
+    max_population_district: int = 400_000
+    max_population_neighborhood: int = 80_000
     
     # Performance Configuration
-    max_conversation_history: int = Field(default=4, env="MAX_CONVERSATION_HISTORY")
-    enable_precompiled_queries: bool = Field(default=True, env="ENABLE_PRECOMPILED_QUERIES")
+    max_conversation_history: int = 2  # Kept verbatim, older messages are summarized
+    memory_recent_token_budget: int = 800
+    enable_precompiled_queries: bool = True
+    # Stricter than the semantic cache: a paraphrase routed to the wrong
+    # precompiled query returns a confidently wrong answer
+    precompiled_vector_threshold: float = 0.95
+    prewarm_on_startup: bool = True  # Initialize the agent before serving
+    intermediate_step_max_chars: int = 1000  # Per tool observation
+    health_refresh_seconds: int = 30  # How often the /health payload is rebuilt
+    query_batch_max_size: int = 20  # Questions per /query/batch request
+    
+    # Conversation Memory Configuration
+    memory_summary_model: str = "gpt-4o-mini"
+    memory_summary_max_tokens: int = 200
+    memory_max_sessions: int = 1000
     
     # Logging Configuration
-    log_level: str = Field(default="INFO", env="LOG_LEVEL")
-    log_format: str = Field(
-        default="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        env="LOG_FORMAT"
-    )
+    log_level: str = "INFO"
+    log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_json: bool = False  # One JSON object per line, with structured fields
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = False
-        extra = "ignore"  # Ignore extra environment variables
+    # Set once the required directories are known to exist
+    _paths_validated: bool = PrivateAttr(default=False)
     
-    @property
+    @cached_property
     def enhanced_prompt_path(self) -> Path:
         """Get the full path to the enhanced prompt file"""
         return self.prompt_dir / self.enhanced_prompt_file
     
-    @property
+    @cached_property
     def fallback_prompt_path(self) -> Path:
         """Get the full path to the fallback prompt file"""
         return self.prompt_dir / self.fallback_prompt_file
     
     def validate_paths(self) -> bool:
-        """Validate that required paths exist"""
-        required_paths = [self.prompt_dir, self.docs_dir]
+        """Validate that required paths exist, creating them on the first call"""
+        if self._paths_validated:
+            return True
         
-        for path in required_paths:
-            if not path.exists():
-                path.mkdir(parents=True, exist_ok=True)
+        for path in (self.prompt_dir, self.docs_dir):
+            path.mkdir(parents=True, exist_ok=True)
         
+        self._paths_validated = True
         return True
     
-    def get_openai_config(self) -> dict:
-        """Get OpenAI configuration as a dictionary"""
-        return {
+    @cached_property
+    def openai_config(self) -> Mapping[str, Any]:
+        """OpenAI configuration, built once as a read-only mapping"""
+        return MappingProxyType({
             "model": self.openai_model,
             "temperature": self.openai_temperature,
             "openai_api_key": self.openai_api_key,
             "request_timeout": self.openai_timeout,
             "max_tokens": self.openai_max_tokens
-        }
-    
-    def get_cors_config(self) -> dict:
-        """Get CORS configuration as a dictionary"""
-        return {
-            "allow_origins": self.cors_origins,
+        })
+    
+    @cached_property
+    def openai_sql_config(self) -> Mapping[str, Any]:
+        """OpenAI configuration for the SQL toolkit model, built once as a read-only mapping"""
+        return MappingProxyType({
+            **self.openai_config,
+            "model": self.openai_sql_model,
+            "max_tokens": self.openai_sql_max_tokens
+        })
+    
+    @cached_property
+    def cors_config(self) -> Mapping[str, Any]:
+        """CORS configuration, built once as a read-only mapping"""
+        return MappingProxyType({
+            "allow_origins": list(self.cors_origins),
             "allow_credentials": self.cors_allow_credentials,
-            "allow_methods": self.cors_allow_methods,
-            "allow_headers": self.cors_allow_headers
+            "allow_methods": list(self.cors_allow_methods),
+            "allow_headers": list(self.cors_allow_headers),
+            "max_age": self.cors_max_age
+        })
+    
+    def get_openai_config(self) -> Mapping[str, Any]:
+        """Get OpenAI configuration as a read-only mapping, copy with dict() to modify"""
+        return self.openai_config
+    
+    def get_openai_sql_config(self) -> Mapping[str, Any]:
+        """Get OpenAI configuration for the SQL toolkit model as a read-only mapping"""
+        return self.openai_sql_config
+    
+    def get_database_config(self) -> dict:
+        """Get SQLAlchemy engine configuration as a dictionary"""
+        # Every worker opens its own pool, keep their sum within the server's limit
+        per_worker = max(1, self.database_max_connections // max(1, self.workers))
+        pool_size = min(self.database_pool_size, per_worker)
+        return {
+            "pool_size": pool_size,
+            "max_overflow": min(self.database_max_overflow, per_worker - pool_size),
+            "pool_timeout": self.database_timeout,
+            "pool_recycle": self.database_pool_recycle,
+            "pool_pre_ping": True,
+            "connect_args": {
+                "sslmode": self.database_sslmode,
+                "connect_timeout": self.database_timeout,
+                "application_name": "auq_nlp"
+            }
         }
+    
+    def get_cors_config(self) -> Mapping[str, Any]:
+        """Get CORS configuration as a read-only mapping"""
+        return self.cors_config
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Get the application settings, read from the environment on first call
+    
+    Returns:
+        Settings: The shared settings instance
+    """
+    return Settings()
 
 
-# Global settings instance
-settings = Settings() 
\ No newline at end of file
+def __getattr__(name):
+    # ``settings`` is resolved on first access (PEP 562), so importing this
+    # module does not read the environment or .env file
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,278 @@
+"""
+Semantic Cache for AUQ NLP
+
+Embedding-based cache that matches paraphrased questions against previously
+answered ones, so near-duplicate questions skip the LangChain agent entirely.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import os
+import pickle
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class LocalEmbeddings:
+    """
+    Sentence-transformers embeddings computed in-process
+    
+    Provides the ``aembed_documents`` interface the cache uses. The model is
+    loaded on first use and encoding runs in the default executor, so the
+    event loop is not blocked.
+    """
+    
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        if importlib.util.find_spec("sentence_transformers") is None:
+            raise ImportError("sentence-transformers is required for local embeddings")
+        
+        self.model_name = model_name
+        self._model = None
+    
+    def embed_documents(self, texts: List[str]) -> List[np.ndarray]:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            
+            self._model = SentenceTransformer(self.model_name)
+        return list(self._model.encode(texts, normalize_embeddings=True))
+    
+    async def aembed_documents(self, texts: List[str]) -> List[np.ndarray]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.embed_documents, texts)
+
+
+class SemanticCache:
+    """
+    In-memory semantic cache backed by a normalized embedding matrix
+
+    Embeddings are stored L2-normalized in a preallocated matrix, so a lookup
+    is a single matrix-vector product followed by an argmax. Entries are only
+    matched against entries recorded with the same context, and are evicted
+    in LRU order once ``max_size`` is reached.
+    
+    Question embeddings are micro-batched: a question is embedded right away
+    when no embedding call is in flight, otherwise it waits for the running
+    call and is sent with the others queued meanwhile, up to ``batch_size``
+    per call.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        max_size: int = 1024,
+        threshold: float = 0.95,
+        ttl_seconds: int = 3600,
+        batch_size: int = 32,
+        model_name: str = ""
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = batch_size
+        
+        self._pending: List[Tuple[str, "asyncio.Future[np.ndarray]"]] = []
+        self._batches_in_flight = 0
+
+        # Slot-based storage, the matrix is allocated on first insert
+        self._vectors: Optional[np.ndarray] = None
+        self._active = np.zeros(max_size, dtype=bool)
+        self._contexts = np.zeros(max_size, dtype=np.int64)
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        # Slots are handed out lowest first, so lookups only scan up to here
+        self._size = 0
+
+        # Scratch buffers reused by every lookup
+        self._scores = np.empty(max_size, dtype=np.float32)
+        self._mask = np.empty(max_size, dtype=bool)
+
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """Normalize a question before embedding it"""
+        return " ".join(question.lower().split())
+
+    @staticmethod
+    def _context_tag(context: str) -> int:
+        """Map a context string to a compact integer tag"""
+        digest = hashlib.blake2b(context.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little", signed=True)
+
+    @staticmethod
+    def _to_unit_vector(vector: Any) -> np.ndarray:
+        """Convert an embedding to a float32 unit vector"""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+
+    async def embed(self, question: str) -> np.ndarray:
+        """Embed a question into a normalized vector"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((self._normalize_question(question), future))
+        
+        if self._batches_in_flight == 0 or len(self._pending) >= self.batch_size:
+            self._flush_pending()
+        
+        return await future
+    
+    async def embed_many(self, questions: List[str]) -> np.ndarray:
+        """Embed several questions into a matrix of normalized row vectors"""
+        vectors = await asyncio.gather(*(self.embed(question) for question in questions))
+        return np.stack(vectors)
+    
+    def _flush_pending(self):
+        """Send the queued questions to the embedding model in one call"""
+        batch = self._pending[:self.batch_size]
+        self._pending = self._pending[self.batch_size:]
+        if batch:
+            self._batches_in_flight += 1
+            asyncio.ensure_future(self._embed_batch(batch))
+    
+    async def _embed_batch(self, batch: List[Tuple[str, "asyncio.Future[np.ndarray]"]]):
+        """Embed a batch of questions and resolve their futures"""
+        try:
+            vectors = await self.embeddings.aembed_documents([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(self._to_unit_vector(vector))
+        finally:
+            self._batches_in_flight -= 1
+            if self._pending and self._batches_in_flight == 0:
+                self._flush_pending()
+
+    def lookup(self, vector: np.ndarray, context: str = "") -> Optional[str]:
+        """
+        Find the cached answer closest to the given question embedding
+
+        Args:
+            vector: Normalized question embedding
+            context: Context the question was asked in
+
+        Returns:
+            Cached answer if the best match is above the threshold, else None
+        """
+        if self._vectors is None or not self._entries:
+            return None
+
+        size = self._size
+        scores = np.matmul(self._vectors[:size], vector, out=self._scores[:size])
+
+        # Exclude free slots and other contexts in place, without temporaries
+        excluded = np.equal(self._contexts[:size], self._context_tag(context), out=self._mask[:size])
+        excluded &= self._active[:size]
+        np.logical_not(excluded, out=excluded)
+        np.copyto(scores, -np.inf, where=excluded)
+
+        slot = int(np.argmax(scores))
+        if scores[slot] < self.threshold:
+            return None
+
+        entry = self._entries[slot]
+        if time.time() - entry["timestamp"] > self.ttl_seconds:
+            self._release(slot)
+            return None
+
+        self._entries.move_to_end(slot)
+        return entry["response"]
+
+    def add(self, vector: np.ndarray, question: str, response: str, context: str = ""):
+        """Store an answer under the given question embedding"""
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+
+        if not self._free_slots:
+            oldest_slot = next(iter(self._entries))
+            self._release(oldest_slot)
+
+        slot = self._free_slots.pop()
+        self._size = max(self._size, slot + 1)
+        self._vectors[slot] = vector
+        self._contexts[slot] = self._context_tag(context)
+        self._active[slot] = True
+        self._entries[slot] = {
+            "response": response,
+            "question": question,
+            "timestamp": time.time()
+        }
+
+    def _release(self, slot: int):
+        """Free a slot so it can be reused"""
+        self._active[slot] = False
+        del self._entries[slot]
+        self._free_slots.append(slot)
+
+    def clear(self):
+        """Clear all cached entries"""
+        self._active[:] = False
+        self._entries.clear()
+        self._free_slots = list(range(self.max_size - 1, -1, -1))
+        self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold
+        }
+
+    def save(self, path: Path):
+        """Persist cached entries to disk"""
+        slots = list(self._entries)
+        state = {
+            "model": self.model_name,
+            "vectors": self._vectors[slots] if slots else None,
+            "contexts": self._contexts[slots],
+            "entries": [self._entries[slot] for slot in slots]
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so workers saving at shutdown never leave a torn file
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, path: Path) -> int:
+        """
+        Restore cached entries previously written by ``save``
+
+        Returns:
+            Number of entries restored
+        """
+        if not path.exists():
+            return 0
+
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+
+        self.clear()
+        # Vectors from another embedding model are not comparable
+        if state["vectors"] is None or state.get("model", "") != self.model_name:
+            return 0
+
+        # Keep the most recently used entries if the cache shrank
+        start = max(0, len(state["entries"]) - self.max_size)
+        for vector, context_tag, entry in zip(
+            state["vectors"][start:], state["contexts"][start:], state["entries"][start:]
+        ):
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            slot = self._free_slots.pop()
+            self._size = max(self._size, slot + 1)
+            self._vectors[slot] = vector
+            self._contexts[slot] = context_tag
+            self._active[slot] = True
+            self._entries[slot] = entry
+
+        return len(self._entries)
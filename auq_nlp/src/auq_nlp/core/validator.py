@@ -9,19 +9,74 @@ Version: 1.0.0
 """
 
 from typing import Any, List, Dict, Optional, Union
+import difflib
 import re
-from ..utils.logging import warning, error, info
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # Optional speedup, falls back to difflib
+    fuzz = process = None
+
+# Compiled once: write and DDL keywords, runs of whitespace, and the
+# "St"/"St." abbreviation of "Sant"
+_DANGEROUS_SQL_RE = re.compile(r"\b(drop|delete|truncate|alter|update|insert)\b", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_SAINT_ABBREVIATION_RE = re.compile(r"\bSt\.?\s+")
+
+# Type tuples for the per-row checks, built once
+_NUMBER_TYPES = (int, float)
+_FLOAT_SAFE_TYPES = frozenset({int, float, bool})
+
+# Above this many rows, population values are checked with NumPy
+_VECTORIZE_MIN_ROWS = 64
+
+
+def _count_from_number(value: Any) -> Any:
+    """A scalar result is the count itself"""
+    return value
+
+
+def _count_from_row(row: Any) -> Any:
+    """The count is the first column of a row"""
+    return row[0] if row else None
+
+
+def _count_from_rows(rows: list) -> Any:
+    """The count is the first row's count, a scalar or its first column"""
+    if not rows:
+        return None
+    extract = _ROW_COUNT_EXTRACTORS.get(type(rows[0]))
+    return extract(rows[0]) if extract else None
+
+
+# Count extraction dispatched on the exact result type
+_ROW_COUNT_EXTRACTORS = {
+    tuple: _count_from_row,
+    list: _count_from_row,
+    int: _count_from_number,
+    float: _count_from_number,
+    bool: _count_from_number,
+}
+_COUNT_EXTRACTORS = {
+    list: _count_from_rows,
+    int: _count_from_number,
+    float: _count_from_number,
+    bool: _count_from_number,
+}
 
 
 class ResultValidator:
     """Validates SQL query results for data quality and logical consistency"""
     
     # Known valid Barcelona districts
-    VALID_DISTRICTS = {
+    VALID_DISTRICTS = frozenset({
         "Ciutat Vella", "Eixample", "Sants-Montjuïc", "Les Corts", 
         "Sarrià-Sant Gervasi", "Gràcia", "Horta-Guinardó", "Nou Barris",
         "Sant Andreu", "Sant Martí"
-    }
+    })
+    
+    # Case-insensitive index of the district names, casefolded name -> name
+    _DISTRICTS_BY_CASEFOLD = {district.casefold(): district for district in VALID_DISTRICTS}
     
     # Population ranges for validation (approximate)
     POPULATION_RANGES = {
@@ -47,27 +102,35 @@ class ResultValidator:
         
         try:
             # Handle different result formats
-            if isinstance(result, list) and len(result) > 0:
+            if isinstance(result, list) and len(result) > _VECTORIZE_MIN_ROWS:
+                self._check_population_rows(result, geo_level, validation)
+            
+            elif isinstance(result, list) and len(result) > 0:
+                # Fixed for the whole result set, so looked up once
+                population_range = self.POPULATION_RANGES.get(geo_level) if geo_level else None
+                if population_range is not None:
+                    min_pop, max_pop = population_range
+                check_districts = geo_level == 2
+                is_known_district = self._is_known_district
+                
                 for row in result:
                     if len(row) >= 2:
                         name, value = row[0], row[1]
                         
                         # Validate population value
-                        if isinstance(value, (int, float)):
+                        if isinstance(value, _NUMBER_TYPES):
                             if value < 0:
                                 validation["errors"].append(f"Negative population for {name}: {value}")
                                 validation["is_valid"] = False
                             
-                            elif geo_level and geo_level in self.POPULATION_RANGES:
-                                min_pop, max_pop = self.POPULATION_RANGES[geo_level]
-                                if value < min_pop or value > max_pop:
-                                    validation["warnings"].append(
-                                        f"Population {value:,.0f} for {name} seems unusual "
-                                        f"(expected range: {min_pop:,.0f}-{max_pop:,.0f})"
-                                    )
+                            elif population_range is not None and (value < min_pop or value > max_pop):
+                                validation["warnings"].append(
+                                    f"Population {value:,.0f} for {name} seems unusual "
+                                    f"(expected range: {min_pop:,.0f}-{max_pop:,.0f})"
+                                )
                         
                         # Validate district names
-                        if geo_level == 2 and name not in self.VALID_DISTRICTS:
+                        if check_districts and not is_known_district(name):
                             validation["warnings"].append(f"Unknown district name: {name}")
             
         except Exception as e:
@@ -76,6 +139,61 @@ class ResultValidator:
         
         return validation
     
+    def _check_population_rows(self, result: list, geo_level: Optional[int], validation: Dict[str, Any]):
+        """
+        Check many population rows at once, reporting them like the row loop
+        
+        The value comparisons are vectorized; messages are only formatted for
+        the flagged rows, in row order.
+        """
+        # Imported here, small results never need NumPy
+        import numpy as np
+        
+        rows = result if min(map(len, result)) >= 2 else [row for row in result if len(row) >= 2]
+        names = [row[0] for row in rows]
+        raw_values = [row[1] for row in rows]
+        
+        if set(map(type, raw_values)) <= _FLOAT_SAFE_TYPES:
+            values = np.array(raw_values, dtype=np.float64)
+        else:
+            # Non-numeric values become NaN, which fails every comparison
+            values = np.fromiter(
+                (value if isinstance(value, _NUMBER_TYPES) else np.nan for value in raw_values),
+                dtype=np.float64,
+                count=len(raw_values)
+            )
+        negative = values < 0
+        
+        out_of_range = np.zeros(len(rows), dtype=bool)
+        if geo_level and geo_level in self.POPULATION_RANGES:
+            min_pop, max_pop = self.POPULATION_RANGES[geo_level]
+            out_of_range = ~negative & ((values < min_pop) | (values > max_pop))
+        
+        unknown = np.zeros(len(rows), dtype=bool)
+        if geo_level == 2:
+            # Each distinct name is looked up once
+            try:
+                unknown_names = {name for name in set(names) if not self._is_known_district(name)}
+                flags = map(unknown_names.__contains__, names)
+            except TypeError:  # Unhashable names
+                flags = (not self._is_known_district(name) for name in names)
+            unknown = np.fromiter(flags, dtype=bool, count=len(names))
+        
+        for i in np.flatnonzero(negative | out_of_range | unknown):
+            name, value = names[i], raw_values[i]
+            
+            if negative[i]:
+                validation["errors"].append(f"Negative population for {name}: {value}")
+                validation["is_valid"] = False
+            elif out_of_range[i]:
+                validation["warnings"].append(
+                    f"Population {value:,.0f} for {name} seems unusual "
+                    f"(expected range: {min_pop:,.0f}-{max_pop:,.0f})"
+                )
+            
+            if unknown[i]:
+                validation["warnings"].append(f"Unknown district name: {name}")
+    
     def validate_geographic_entity(self, name: str, geo_level: int) -> Dict[str, Any]:
         """Validate geographic entity names"""
         validation = {
@@ -92,11 +210,11 @@ class ResultValidator:
         
         # Check district names
         if geo_level == 2:
-            if name not in self.VALID_DISTRICTS:
+            if not self._is_known_district(name):
                 validation["warnings"].append(f"'{name}' is not a known Barcelona district")
                 
                 # Suggest similar names
-                suggestions = self._find_similar_names(name, self.VALID_DISTRICTS)
+                suggestions = self._find_similar_names(name, self._DISTRICTS_BY_CASEFOLD)
                 if suggestions:
                     validation["suggestions"] = suggestions
         
@@ -118,16 +236,9 @@ class ResultValidator:
         }
         
         try:
-            count = None
-            
             # Extract count from different result formats
-            if isinstance(result, (int, float)):
-                count = result
-            elif isinstance(result, list) and len(result) > 0:
-                if isinstance(result[0], (int, float)):
-                    count = result[0]
-                elif isinstance(result[0], (list, tuple)) and len(result[0]) > 0:
-                    count = result[0][0]
+            extract = _COUNT_EXTRACTORS.get(type(result))
+            count = extract(result) if extract else None
             
             if count is not None:
                 if count < 0:
@@ -167,12 +278,12 @@ class ResultValidator:
         
         query_lower = query.lower().strip()
         
-        # Check for dangerous operations
-        dangerous_keywords = ["drop", "delete", "truncate", "alter", "update", "insert"]
-        for keyword in dangerous_keywords:
-            if f" {keyword} " in query_lower or query_lower.startswith(keyword):
-                validation["errors"].append(f"Dangerous SQL operation detected: {keyword}")
-                validation["is_valid"] = False
+        # Reject dangerous operations outright, the remaining checks are moot
+        match = _DANGEROUS_SQL_RE.search(query_lower)
+        if match:
+            validation["errors"].append(f"Dangerous SQL operation detected: {match.group(1)}")
+            validation["is_valid"] = False
+            return validation
         
         # Check for best practices
         if "geographical_unit_view" not in query_lower:
@@ -195,69 +306,71 @@ class ResultValidator:
     
     def _clean_name(self, name: str) -> str:
         """Clean and normalize geographic names"""
-        # Remove extra whitespace
-        cleaned = re.sub(r'\s+', ' ', name.strip())
-        
-        # Common normalizations
-        replacements = {
-            "Sant ": "Sant ",  # Ensure proper spacing
-            "St ": "Sant ",
-            "St. ": "Sant ",
-        }
-        
-        for old, new in replacements.items():
-            cleaned = cleaned.replace(old, new)
-        
-        return cleaned
+        # Expand "St"/"St." to "Sant", then remove extra whitespace
+        return _WHITESPACE_RE.sub(' ', _SAINT_ABBREVIATION_RE.sub('Sant ', name.strip()))
+    
+    def _is_known_district(self, name: Any) -> bool:
+        """Check a district name against the known districts, ignoring case"""
+        return isinstance(name, str) and name.casefold() in self._DISTRICTS_BY_CASEFOLD
     
-    def _find_similar_names(self, name: str, valid_names: set, threshold: float = 0.6) -> List[str]:
-        """Find similar names using simple string similarity"""
-        name_lower = name.lower()
-        suggestions = []
+    def _find_similar_names(
+        self,
+        name: str,
+        valid_names: Dict[str, str],
+        threshold: float = 0.6
+    ) -> List[str]:
+        """
+        Find similar names using fuzzy string matching
         
-        for valid_name in valid_names:
-            valid_lower = valid_name.lower()
-            
-            # Simple similarity based on common characters
-            if name_lower in valid_lower or valid_lower in name_lower:
-                suggestions.append(valid_name)
-            elif self._calculate_similarity(name_lower, valid_lower) > threshold:
-                suggestions.append(valid_name)
+        Args:
+            name: Name to find matches for
+            valid_names: Casefolded valid names mapped to their display form
+            threshold: Minimum similarity for a suggestion, between 0 and 1
         
-        return suggestions[:3]  # Return top 3 suggestions
-    
-    def _calculate_similarity(self, str1: str, str2: str) -> float:
-        """Calculate simple string similarity (Jaccard similarity)"""
-        set1 = set(str1.split())
-        set2 = set(str2.split())
+        Returns:
+            Up to three similar valid names, best match first
+        """
+        name_lower = name.casefold()
         
-        if not set1 and not set2:
-            return 1.0
+        if process is not None:
+            matches = process.extract(
+                name_lower,
+                valid_names.keys(),
+                scorer=fuzz.WRatio,
+                limit=3,
+                score_cutoff=threshold * 100
+            )
+            return [valid_names[match] for match, _, _ in matches]
         
-        intersection = len(set1.intersection(set2))
-        union = len(set1.union(set2))
+        # Substring matches first, then close spellings
+        suggestions = [
+            valid_name for valid_lower, valid_name in valid_names.items()
+            if name_lower in valid_lower or valid_lower in name_lower
+        ]
+        for match in difflib.get_close_matches(name_lower, valid_names.keys(), n=3, cutoff=threshold):
+            if valid_names[match] not in suggestions:
+                suggestions.append(valid_names[match])
         
-        return intersection / union if union > 0 else 0.0
+        return suggestions[:3]  # Return top 3 suggestions
     
     def generate_validation_report(self, validations: List[Dict[str, Any]]) -> str:
         """Generate a human-readable validation report"""
         total_validations = len(validations)
         valid_count = sum(1 for v in validations if v["is_valid"])
         
-        report = f"Validation Report: {valid_count}/{total_validations} passed\n"
+        # Collected and joined once, instead of rebuilding the string per line
+        parts = [f"Validation Report: {valid_count}/{total_validations} passed\n"]
         
         for i, validation in enumerate(validations):
             if validation["errors"]:
-                report += f"\nErrors in validation {i+1}:\n"
-                for error in validation["errors"]:
-                    report += f"  ❌ {error}\n"
+                parts.append(f"\nErrors in validation {i+1}:\n")
+                parts.extend(f"  ❌ {error}\n" for error in validation["errors"])
             
             if validation["warnings"]:
-                report += f"\nWarnings in validation {i+1}:\n"
-                for warning in validation["warnings"]:
-                    report += f"  ⚠️ {warning}\n"
+                parts.append(f"\nWarnings in validation {i+1}:\n")
+                parts.extend(f"  ⚠️ {warning}\n" for warning in validation["warnings"])
         
-        return report
+        return "".join(parts)
 
 
 # Global validator instance
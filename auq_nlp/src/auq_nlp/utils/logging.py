@@ -2,39 +2,98 @@
 Logging utilities for AUQ NLP
 
 Provides centralized logging configuration and emoji-enhanced loggers.
+Records are handed to a background thread through a queue, so formatting
+and writing to stdout stay off the request path.
 """
 
+import atexit
+import copy
 import logging
+import queue
 import sys
-from typing import Optional
-from ..core.config import settings
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+import orjson
+
+from ..core.config import get_settings
+
+
+EMOJI_MAP = {
+    'DEBUG': '🔍',
+    'INFO': '💡',
+    'WARNING': '⚠️',
+    'ERROR': '❌',
+    'CRITICAL': '🚨'
+}
+
+# Third-party loggers that only log warnings and above
+_QUIET_LOGGERS = ("uvicorn", "httpx", "openai")
+
+# Emoji placeholder for each format style
+_EMOJI_FIELDS = {'%': '%(emoji)s', '{': '{emoji}', '$': '${emoji}'}
+
+# Attributes every LogRecord has; anything else was passed as a field
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "emoji", "taskName"}
+
+# Writes the queued records, replaced on each setup_logging call
+_queue_listener: Optional[QueueListener] = None
 
 
 class EmojiFormatter(logging.Formatter):
     """Custom formatter that adds emojis to log levels"""
     
-    EMOJI_MAP = {
-        'DEBUG': '🔍',
-        'INFO': '💡',
-        'WARNING': '⚠️',
-        'ERROR': '❌',
-        'CRITICAL': '🚨'
-    }
+    EMOJI_MAP = EMOJI_MAP
+    
+    def __init__(self, fmt: Optional[str] = None, datefmt: Optional[str] = None, style: str = '%', **kwargs):
+        # Prefix the emoji in the format itself, so each record is formatted in one pass
+        fmt = fmt or _EMOJI_FIELDS[style].replace('emoji', 'message')  # Formatter's default, e.g. %(message)s
+        if _EMOJI_FIELDS[style] not in fmt:
+            fmt = f"{_EMOJI_FIELDS[style]} {fmt}"
+        super().__init__(fmt, datefmt, style, **kwargs)
     
     def format(self, record):
-        # Add emoji to the log level
-        emoji = self.EMOJI_MAP.get(record.levelname, '📝')
-        record.emoji = emoji
-        
-        # Format the message
-        formatted = super().format(record)
-        return f"{emoji} {formatted}"
+        record.emoji = EMOJI_MAP.get(record.levelname, '📝')
+        return super().format(record)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting, exceptions included, to the listener"""
+    
+    def prepare(self, record):
+        # QueueHandler.prepare formats the record here and drops exc_info, so
+        # JsonFormatter could not render the exception; only merge the args
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatter that renders each record as one JSON line, fields included"""
+    
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
 
 
 def setup_logging(
     level: Optional[str] = None,
     format_string: Optional[str] = None,
-    use_emoji: bool = True
+    use_emoji: bool = True,
+    json_format: Optional[bool] = None
 ) -> None:
     """
     Setup application logging configuration
@@ -43,15 +102,23 @@ def setup_logging(
         level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         format_string: Custom format string
         use_emoji: Whether to use emoji formatter
+        json_format: Whether to log JSON lines, defaults to the LOG_JSON setting
     """
+    global _queue_listener
+    
+    settings = get_settings()
     log_level = level or settings.log_level
     log_format = format_string or settings.log_format
+    if json_format is None:
+        json_format = settings.log_json
     
     # Convert string level to logging constant
     numeric_level = getattr(logging, log_level.upper(), logging.INFO)
     
     # Create formatter
-    if use_emoji:
+    if json_format:
+        formatter = JsonFormatter()
+    elif use_emoji:
         formatter = EmojiFormatter(log_format)
     else:
         formatter = logging.Formatter(log_format)
@@ -61,21 +128,35 @@ def setup_logging(
     root_logger.setLevel(numeric_level)
     
     # Clear existing handlers
-    for handler in root_logger.handlers[:]:
-        root_logger.removeHandler(handler)
+    root_logger.handlers.clear()
     
     # Create console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(numeric_level)
     console_handler.setFormatter(formatter)
     
-    # Add handler to root logger
-    root_logger.addHandler(console_handler)
+    # The console handler runs on the listener thread; callers only enqueue
+    shutdown_logging()
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(_RecordQueueHandler(log_queue))
+    _queue_listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    _queue_listener.start()
     
     # Set specific loggers to appropriate levels
-    logging.getLogger("uvicorn").setLevel(logging.WARNING)
-    logging.getLogger("httpx").setLevel(logging.WARNING)
-    logging.getLogger("openai").setLevel(logging.WARNING)
+    for name in _QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """Write out the queued records and stop the logging thread"""
+    global _queue_listener
+    
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+atexit.register(shutdown_logging)
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -91,26 +172,50 @@ def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
 
 
-# Convenience functions with emojis (for backward compatibility)
-def info(message: str, logger_name: str = "auq_nlp") -> None:
+# Logger behind the convenience functions, looked up once
+_DEFAULT_LOGGER_NAME = "auq_nlp"
+_default_logger = logging.getLogger(_DEFAULT_LOGGER_NAME)
+
+
+def _logger_for(logger_name: str) -> logging.Logger:
+    """Get the default logger without a lookup, or the named one"""
+    if logger_name == _DEFAULT_LOGGER_NAME:
+        return _default_logger
+    return get_logger(logger_name)
+
+
+def _extra(fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Prefix fields named like LogRecord attributes, which ``extra`` rejects"""
+    if not fields or _RECORD_ATTRIBUTES.isdisjoint(fields):
+        return fields
+    return {
+        f"field_{key}" if key in _RECORD_ATTRIBUTES else key: value
+        for key, value in fields.items()
+    }
+
+
+# Convenience functions with emojis (for backward compatibility).
+# Keyword arguments are attached to the record as fields, shown by JsonFormatter
+def debug(message: str, logger_name: str = _DEFAULT_LOGGER_NAME, **fields: Any) -> None:
+    """Log debug message with emoji"""
+    _logger_for(logger_name).debug(message, extra=_extra(fields))
+
+
+def info(message: str, logger_name: str = _DEFAULT_LOGGER_NAME, **fields: Any) -> None:
     """Log info message with emoji"""
-    logger = get_logger(logger_name)
-    logger.info(message)
+    _logger_for(logger_name).info(message, extra=_extra(fields))
 
 
-def success(message: str, logger_name: str = "auq_nlp") -> None:
+def success(message: str, logger_name: str = _DEFAULT_LOGGER_NAME, **fields: Any) -> None:
     """Log success message (as info with special emoji)"""
-    logger = get_logger(logger_name)
-    logger.info(f"✅ {message}")
+    _logger_for(logger_name).info(f"✅ {message}", extra=_extra(fields))
 
 
-def warning(message: str, logger_name: str = "auq_nlp") -> None:
+def warning(message: str, logger_name: str = _DEFAULT_LOGGER_NAME, **fields: Any) -> None:
     """Log warning message with emoji"""
-    logger = get_logger(logger_name)
-    logger.warning(message)
+    _logger_for(logger_name).warning(message, extra=_extra(fields))
 
 
-def error(message: str, logger_name: str = "auq_nlp") -> None:
+def error(message: str, logger_name: str = _DEFAULT_LOGGER_NAME, **fields: Any) -> None:
     """Log error message with emoji"""
-    logger = get_logger(logger_name)
-    logger.error(message) 
\ No newline at end of file
+    _logger_for(logger_name).error(message, extra=_extra(fields))
@@ -0,0 +1,60 @@
+"""
+Metrics utilities for AUQ NLP
+
+Prometheus metrics that decompose query latency into LLM calls and SQL tool
+calls. ``prometheus_client`` and ``prometheus-fastapi-instrumentator`` are
+optional; without them metrics are disabled.
+"""
+
+from fastapi import FastAPI
+
+from ..core.config import get_settings
+from .logging import warning
+
+try:
+    from prometheus_client import Histogram
+except ImportError:  # pragma: no cover - optional dependency
+    Histogram = None
+
+if Histogram is not None:
+    LLM_CALL_SECONDS = Histogram(
+        "llm_call_seconds",
+        "Duration of LLM calls made by the agent",
+        ["model"]
+    )
+    SQL_TOOL_SECONDS = Histogram(
+        "sql_tool_seconds",
+        "Duration of SQL tool calls made by the agent",
+        ["tool"]
+    )
+else:
+    LLM_CALL_SECONDS = None
+    SQL_TOOL_SECONDS = None
+
+
+def metrics_enabled() -> bool:
+    """Whether agent step metrics should be recorded"""
+    return get_settings().metrics_enabled and Histogram is not None
+
+
+def setup_metrics(app: FastAPI) -> bool:
+    """
+    Instrument HTTP requests and expose metrics at ``/metrics``
+    
+    Args:
+        app: FastAPI application to instrument
+    
+    Returns:
+        bool: True if metrics were exposed, False otherwise
+    """
+    if not get_settings().metrics_enabled:
+        return False
+    
+    try:
+        from prometheus_fastapi_instrumentator import Instrumentator
+    except ImportError:
+        warning("prometheus-fastapi-instrumentator not installed, /metrics disabled")
+        return False
+    
+    Instrumentator().instrument(app).expose(app, include_in_schema=False)
+    return True
@@ -0,0 +1,185 @@
+"""
+Unit tests for the exact-match query cache and the precompiled query matcher
+"""
+
+import pytest
+
+from auq_nlp.core import cache as cache_module
+from auq_nlp.core.cache import PrecompiledQueries, QueryCache
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_make_key_ignores_case_and_whitespace():
+    key = QueryCache.make_key("Población de  Barcelona ")
+
+    assert QueryCache.make_key("población de barcelona") == key
+    assert QueryCache.make_key("POBLACIÓN\tDE\nBARCELONA") == key
+
+
+def test_make_key_depends_on_context():
+    assert QueryCache.make_key("question", "context a") != QueryCache.make_key("question", "context b")
+    assert QueryCache.make_key("question") != QueryCache.make_key("question", "context")
+
+
+def test_get_returns_cached_response():
+    query_cache = QueryCache()
+    query_cache.set("How many districts?", "Ten", "ctx")
+
+    assert query_cache.get("how many  districts?", "ctx") == "Ten"
+    assert query_cache.get("How many districts?", "other ctx") is None
+
+
+def test_get_and_set_accept_a_precomputed_key():
+    query_cache = QueryCache()
+    key = QueryCache.make_key("How many districts?", "ctx")
+    query_cache.set("How many districts?", "Ten", key=key)
+
+    assert query_cache.get("How many districts?", "ctx") == "Ten"
+    assert query_cache.get("", key=key) == "Ten"
+
+
+def test_evicts_least_recently_used():
+    query_cache = QueryCache(max_size=2)
+    query_cache.set("a", "A")
+    query_cache.set("b", "B")
+    # Reading "a" makes "b" the least recently used entry
+    assert query_cache.get("a") == "A"
+
+    query_cache.set("c", "C")
+
+    assert query_cache.get("b") is None
+    assert query_cache.get("a") == "A"
+    assert query_cache.get("c") == "C"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    query_cache = QueryCache(ttl_seconds=60)
+    query_cache.set("question", "answer")
+
+    clock.now += 59
+    assert query_cache.get("question") == "answer"
+
+    clock.now += 2
+    assert query_cache.get("question") is None
+    assert query_cache.get_stats()["total_entries"] == 0
+
+
+def test_stats_count_expired_entries(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    query_cache = QueryCache(max_size=10, ttl_seconds=60)
+    query_cache.set("old", "answer")
+    clock.now += 61
+    query_cache.set("new", "answer")
+
+    stats = query_cache.get_stats()
+
+    assert stats["total_entries"] == 2
+    assert stats["valid_entries"] == 1
+    assert stats["expired_entries"] == 1
+
+
+def test_disk_entries_are_shared_between_instances(tmp_path):
+    path = tmp_path / "query_cache.sqlite3"
+    writer = QueryCache(path=path)
+    writer.set("How many districts?", {"answer": "Ten"})
+
+    reader = QueryCache(path=path)
+
+    assert reader.get("how many districts?", disk=False) is None
+    assert reader.get("how many districts?") == {"answer": "Ten"}
+    # Loaded into memory by the disk read
+    assert reader.get("how many districts?", disk=False) == {"answer": "Ten"}
+    assert reader.get_stats()["disk_entries"] == 1
+
+    writer.close()
+    reader.close()
+
+
+def test_memory_only_set_skips_the_disk(tmp_path):
+    query_cache = QueryCache(path=tmp_path / "query_cache.sqlite3")
+    query_cache.set("question", "answer", disk=False)
+
+    assert query_cache.get_stats()["disk_entries"] == 0
+
+    query_cache.persist(QueryCache.make_key("question"), "answer")
+    assert query_cache.get_stats()["disk_entries"] == 1
+    query_cache.close()
+
+
+def test_disk_store_is_pruned_every_interval(tmp_path):
+    store = cache_module._SQLiteStore(tmp_path / "store.sqlite3", max_size=5, ttl_seconds=3600, prune_interval=10)
+
+    for i in range(9):
+        store.set(str(i), i)
+    assert store.count() == 9
+
+    store.set("9", 9)
+    assert store.count() == 5
+    # The most recently written entries are kept
+    assert store.get("9") == 9
+    assert store.get("0") is None
+    store.close()
+
+
+@pytest.fixture(params=["automaton", "scan"])
+def matcher(request, monkeypatch):
+    """Run the matcher tests with Aho-Corasick, when installed, and with the scan fallback"""
+    if request.param == "automaton" and PrecompiledQueries._AUTOMATON is None:
+        pytest.skip("pyahocorasick is not installed")
+    if request.param == "scan":
+        monkeypatch.setattr(PrecompiledQueries, "_AUTOMATON", None)
+    return PrecompiledQueries
+
+
+def test_matcher_finds_pattern_in_question(matcher):
+    query_info = matcher.find_matching_query("¿Cuántos distritos tiene Barcelona?")
+
+    assert query_info is matcher.COMMON_QUERIES["districts_count"]
+
+
+def test_matcher_prefers_first_declared_query(matcher):
+    # Patterns of both queries occur, the later one earlier in the question
+    question = "población por distrito y población de barcelona"
+
+    assert matcher.find_matching_query(question) is matcher.COMMON_QUERIES["population_barcelona"]
+
+
+def test_matcher_returns_none_without_pattern(matcher):
+    assert matcher.find_matching_query("Median rent in Sants") is None
+
+
+def test_char_mask_prefilters_missing_characters():
+    pattern_mask = PrecompiledQueries._char_mask("distritos")
+
+    assert PrecompiledQueries._char_mask("¿cuántos distritos hay?") & pattern_mask == pattern_mask
+    assert PrecompiledQueries._char_mask("median rent") & pattern_mask != pattern_mask
+
+
+def test_format_response_renders_rows():
+    query_info = PrecompiledQueries.COMMON_QUERIES["population_by_district"]
+
+    response = PrecompiledQueries.format_response(
+        query_info["response_template"],
+        [("Eixample", 266477.0), ("Sant Martí", 243000)]
+    )
+
+    assert "• Eixample: 266,477" in response
+    assert "• Sant Martí: 243,000" in response
+
+
+def test_format_response_falls_back_on_unexpected_rows():
+    template = PrecompiledQueries.COMMON_QUERIES["population_barcelona"]["response_template"]
+
+    assert PrecompiledQueries.format_response(template, [("Barcelona",)]) == "Results: [('Barcelona',)]"
@@ -0,0 +1,53 @@
+"""
+Unit tests for the queued logging setup
+"""
+
+import logging
+
+import orjson
+import pytest
+
+from auq_nlp.utils import logging as auq_logging
+
+
+@pytest.fixture
+def json_lines(capsys):
+    """Reader for the JSON lines written through the queue, restoring the root logger after"""
+    root_logger = logging.getLogger()
+    handlers, level = root_logger.handlers[:], root_logger.level
+
+    def read():
+        auq_logging.shutdown_logging()
+        return [orjson.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    yield read
+    auq_logging.shutdown_logging()
+    root_logger.handlers[:] = handlers
+    root_logger.setLevel(level)
+
+
+def test_exceptions_reach_the_json_formatter(json_lines):
+    # Set up in the test, pytest restores the root level after fixture setup
+    auq_logging.setup_logging(level="INFO", json_format=True)
+    try:
+        raise ValueError("bad district")
+    except ValueError:
+        logging.getLogger("auq_nlp").exception("Query %s failed", "q1")
+
+    [entry] = json_lines()
+
+    assert entry["message"] == "Query q1 failed"
+    assert "ValueError: bad district" in entry["exception"]
+
+
+def test_reserved_field_names_are_prefixed(json_lines):
+    auq_logging.setup_logging(level="INFO", json_format=True)
+    auq_logging.info("Query answered", name="Sants", msg="cached", duration_ms=12)
+
+    [entry] = json_lines()
+
+    assert entry["message"] == "Query answered"
+    assert entry["logger"] == "auq_nlp"
+    assert entry["field_name"] == "Sants"
+    assert entry["field_msg"] == "cached"
+    assert entry["duration_ms"] == 12
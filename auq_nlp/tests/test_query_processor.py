@@ -0,0 +1,276 @@
+"""
+Unit tests for the query processing pipeline, with a fake agent
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from auq_nlp.agents import langchain_agent, query_processor
+from auq_nlp.agents.query_processor import QueryProcessor
+from auq_nlp.core.semantic_cache import SemanticCache
+
+
+class FakeAgent:
+    """Agent answering every question after ``release`` is set"""
+
+    def __init__(self):
+        self.is_initialized = True
+        self.calls = []
+        self.steps = []
+        self.sql = []
+        self.release = asyncio.Event()
+
+    async def process_query(self, question, context=""):
+        self.calls.append((question, context))
+        await self.release.wait()
+        return {"success": True, "output": f"Answer to {question}", "intermediate_steps": self.steps}
+
+    async def run_sql(self, sql):
+        self.sql.append(sql)
+        return [(10,)]
+
+
+class PatternEmbeddings:
+    """Embeds each precompiled pattern on its own axis, and questions by ``similar``"""
+
+    def __init__(self, similar):
+        self.axes = {
+            pattern: axis
+            for axis, pattern in enumerate(
+                pattern
+                for query_info in query_processor.PrecompiledQueries.COMMON_QUERIES.values()
+                for pattern in query_info["patterns"]
+            )
+        }
+        # Question -> (pattern, cosine similarity to it)
+        self.similar = similar
+
+    async def aembed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def _embed(self, text):
+        # The last axis is shared by no pattern
+        vector = np.zeros(len(self.axes) + 1)
+        pattern, similarity = self.similar.get(text, (text, 1.0))
+        vector[self.axes.get(pattern, -1)] = similarity
+        vector[-1] += np.sqrt(1 - similarity ** 2)
+        return vector
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = FakeAgent()
+
+    async def get_agent():
+        return agent
+
+    monkeypatch.setattr(query_processor, "get_agent", get_agent)
+    monkeypatch.setattr(query_processor, "get_ready_agent", lambda: agent)
+    return agent
+
+
+@pytest.fixture
+def processor(settings, agent):
+    return QueryProcessor()
+
+
+async def test_identical_queries_share_one_agent_call(processor, agent):
+    requests = [
+        asyncio.ensure_future(processor.process_query("Median rent in Sants?"))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0)
+    agent.release.set()
+
+    responses = await asyncio.gather(*requests)
+
+    assert agent.calls == [("Median rent in Sants?", "")]
+    assert {response["answer"] for response in responses} == {"Answer to Median rent in Sants?"}
+    assert all(response["success"] for response in responses)
+    assert processor._inflight == {}
+
+
+async def test_stream_joins_identical_inflight_query(processor, agent):
+    running = asyncio.ensure_future(processor.process_query("Median rent in Sants?"))
+    while not agent.calls:
+        await asyncio.sleep(0)
+
+    events = []
+
+    async def stream():
+        async for event in processor.stream_query("Median rent in Sants?"):
+            events.append(event)
+
+    streaming = asyncio.ensure_future(stream())
+    for _ in range(10):
+        await asyncio.sleep(0)
+    agent.release.set()
+    await asyncio.gather(running, streaming)
+
+    # FakeAgent cannot stream, so a second agent run would end in an error event
+    assert [event["type"] for event in events] == ["token", "done"]
+    assert events[0]["content"] == "Answer to Median rent in Sants?"
+    assert len(agent.calls) == 1
+
+
+async def test_different_queries_run_separately(processor, agent):
+    agent.release.set()
+
+    await asyncio.gather(
+        processor.process_query("Median rent in Sants?"),
+        processor.process_query("Median rent in Gràcia?")
+    )
+
+    assert sorted(question for question, _ in agent.calls) == [
+        "Median rent in Gràcia?",
+        "Median rent in Sants?"
+    ]
+
+
+async def test_answers_are_cached(processor, agent):
+    agent.release.set()
+
+    first = await processor.process_query("Median rent in Sants?")
+    second = await processor.process_query("median rent in  sants?")
+
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["answer"] == first["answer"]
+    assert len(agent.calls) == 1
+
+
+async def test_cache_hits_skip_building_the_context(processor, agent, monkeypatch):
+    agent.release.set()
+    gracia = [{"question": "Population of Gràcia?", "answer": "About 120,000"}]
+    sants = [{"question": "Population of Sants?", "answer": "About 180,000"}]
+    await processor.process_query("Median rent there?", conversation_history=gracia)
+
+    built = []
+    build_context = processor._build_context
+
+    async def record_build(*args):
+        built.append(args)
+        return await build_context(*args)
+
+    monkeypatch.setattr(processor, "_build_context", record_build)
+
+    hit = await processor.process_query("Median rent there?", conversation_history=gracia)
+    miss = await processor.process_query("Median rent there?", conversation_history=sants)
+
+    assert hit["cached"] is True
+    assert miss["cached"] is False
+    assert len(built) == 1
+    assert agent.calls[-1] == ("Median rent there?", "Recent:\nUser: Population of Sants?\nAssistant: About 180,000")
+
+
+async def test_precompiled_query_runs_sql(processor, agent):
+    response = await processor.process_query("¿Cuántos distritos tiene Barcelona?")
+
+    assert response["answer"] == "Barcelona has 10 districts."
+    assert response["precompiled"] is True
+    assert agent.sql == [query_processor.PrecompiledQueries.COMMON_QUERIES["districts_count"]["sql"]]
+    assert agent.calls == []
+
+
+async def test_paraphrase_is_matched_to_precompiled_query(processor, agent):
+    embeddings = PatternEmbeddings({"barcelona district count": ("how many districts in barcelona", 0.97)})
+    processor.semantic_cache = SemanticCache(embeddings, threshold=0.9)
+    await processor._embed_precompiled_patterns()
+
+    response = await processor.process_query("Barcelona district count")
+
+    assert response["answer"] == "Barcelona has 10 districts."
+    assert response["precompiled"] is True
+    assert agent.calls == []
+
+
+async def test_near_miss_is_not_matched_to_precompiled_query(processor, agent):
+    # Close enough for the semantic cache, but asks about neighborhoods
+    embeddings = PatternEmbeddings({"how many neighborhoods in barcelona": ("how many districts in barcelona", 0.9)})
+    processor.semantic_cache = SemanticCache(embeddings, threshold=0.87)
+    await processor._embed_precompiled_patterns()
+    agent.release.set()
+
+    response = await processor.process_query("How many neighborhoods in Barcelona")
+
+    assert response["precompiled"] is False
+    assert agent.calls == [("How many neighborhoods in Barcelona", "")]
+
+
+async def test_steps_are_returned_only_on_request(settings, processor, agent, monkeypatch):
+    monkeypatch.setattr(settings, "intermediate_step_max_chars", 5)
+    agent.steps = [(SimpleNamespace(tool="sql_db_query", tool_input="SELECT 1"), "0123456789")]
+    agent.release.set()
+
+    plain = await processor.process_query("Median rent in Sants?")
+    detailed = await processor.process_query("Median rent in Gràcia?", include_steps=True)
+
+    assert plain["intermediate_steps"] == []
+    assert detailed["intermediate_steps"] == [
+        {"tool": "sql_db_query", "tool_input": "SELECT 1", "observation": "01234..."}
+    ]
+
+
+async def test_cache_file_is_read_and_written_off_the_loop(settings, agent, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "cache_file", str(tmp_path / "query_cache.sqlite3"))
+    agent.release.set()
+    writer = QueryProcessor()
+    await writer.process_query("Median rent in Sants?")
+    # Let the background file write finish
+    await asyncio.sleep(0.1)
+
+    reader = QueryProcessor()
+    response = await reader.process_query("Median rent in Sants?")
+
+    assert response["cached"] is True
+    assert len(agent.calls) == 1
+    writer.cache.close()
+    reader.cache.close()
+
+
+async def test_warm_up_shares_one_acquisition(processor, monkeypatch):
+    started = []
+    release = asyncio.Event()
+
+    async def get_agent():
+        started.append(True)
+        await release.wait()
+        return "agent"
+
+    monkeypatch.setattr(query_processor, "get_agent", get_agent)
+    monkeypatch.setattr(query_processor, "get_ready_agent", lambda: None)
+
+    first = processor._warm_up_agent()
+    second = processor._warm_up_agent()
+    # A waiter giving up must not cancel the acquisition for the others
+    first.cancel()
+    release.set()
+
+    assert await second == "agent"
+    assert started == [True]
+
+
+async def test_failed_agent_init_is_retried_after_cooldown(settings, monkeypatch):
+    attempts = []
+
+    async def initialize(self):
+        attempts.append(self)
+        return False
+
+    monkeypatch.setattr(langchain_agent.LangChainAgent, "initialize", initialize)
+    monkeypatch.setattr(langchain_agent, "_agent_instance", None)
+    monkeypatch.setattr(langchain_agent, "_agent_lock", None)
+    monkeypatch.setattr(langchain_agent, "_failed_agent", None)
+    monkeypatch.setattr(settings, "agent_init_retry_seconds", 30)
+
+    agents = [await langchain_agent.get_agent() for _ in range(3)]
+
+    assert len(attempts) == 1
+    assert all(agent is attempts[0] and not agent.is_initialized for agent in agents)
+
+    monkeypatch.setattr(langchain_agent, "_agent_failed_at", langchain_agent._agent_failed_at - 31)
+    await langchain_agent.get_agent()
+    assert len(attempts) == 2
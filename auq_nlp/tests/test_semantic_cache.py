@@ -0,0 +1,123 @@
+"""
+Unit tests for the embedding-based semantic cache
+"""
+
+import asyncio
+
+import numpy as np
+
+from auq_nlp.core.semantic_cache import SemanticCache
+
+
+class FakeEmbeddings:
+    """Embeddings looked up from a fixed table, recording every call"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = []
+
+    async def aembed_documents(self, texts):
+        self.calls.append(list(texts))
+        await asyncio.sleep(0)
+        return [self.vectors[text] for text in texts]
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_lookup_hits_above_threshold():
+    cache = SemanticCache(embeddings=None, threshold=0.9)
+    cache.add(unit(1, 0, 0), "population of gràcia", "About 120,000")
+
+    assert cache.lookup(unit(1, 0.1, 0)) == "About 120,000"
+
+
+def test_lookup_misses_below_threshold():
+    cache = SemanticCache(embeddings=None, threshold=0.9)
+    cache.add(unit(1, 0, 0), "population of gràcia", "About 120,000")
+
+    # Cosine similarity of about 0.71
+    assert cache.lookup(unit(1, 1, 0)) is None
+
+
+def test_lookup_only_matches_same_context():
+    cache = SemanticCache(embeddings=None, threshold=0.9)
+    cache.add(unit(1, 0, 0), "and its population?", "About 120,000", context="User: tell me about Gràcia")
+    cache.add(unit(1, 0, 0), "and its population?", "About 180,000", context="User: tell me about Sant Martí")
+
+    assert cache.lookup(unit(1, 0, 0), "User: tell me about Gràcia") == "About 120,000"
+    assert cache.lookup(unit(1, 0, 0), "User: tell me about Sant Martí") == "About 180,000"
+    assert cache.lookup(unit(1, 0, 0)) is None
+
+
+def test_lookup_returns_best_match():
+    cache = SemanticCache(embeddings=None, threshold=0.5)
+    cache.add(unit(1, 1, 0), "near", "near answer")
+    cache.add(unit(1, 0.1, 0), "nearest", "nearest answer")
+
+    assert cache.lookup(unit(1, 0, 0)) == "nearest answer"
+
+
+def test_evicts_least_recently_used():
+    cache = SemanticCache(embeddings=None, max_size=2, threshold=0.99)
+    cache.add(unit(1, 0, 0), "a", "A")
+    cache.add(unit(0, 1, 0), "b", "B")
+    # Looking up "a" makes "b" the least recently used entry
+    assert cache.lookup(unit(1, 0, 0)) == "A"
+
+    cache.add(unit(0, 0, 1), "c", "C")
+
+    assert cache.lookup(unit(0, 1, 0)) is None
+    assert cache.lookup(unit(1, 0, 0)) == "A"
+    assert cache.lookup(unit(0, 0, 1)) == "C"
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = SemanticCache(embeddings=None, threshold=0.9, ttl_seconds=60)
+    cache.add(unit(1, 0, 0), "question", "answer")
+    slot = next(iter(cache._entries))
+    cache._entries[slot]["timestamp"] -= 61
+
+    assert cache.lookup(unit(1, 0, 0)) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+async def test_embed_normalizes_question_and_vector():
+    embeddings = FakeEmbeddings({"population of gràcia": [3.0, 4.0]})
+    cache = SemanticCache(embeddings)
+
+    vector = await cache.embed("  Population of  Gràcia ")
+
+    np.testing.assert_allclose(vector, [0.6, 0.8], rtol=1e-6)
+    assert embeddings.calls == [["population of gràcia"]]
+
+
+async def test_concurrent_embeds_are_batched():
+    texts = [f"question {i}" for i in range(5)]
+    embeddings = FakeEmbeddings({text: [float(i + 1), 1.0] for i, text in enumerate(texts)})
+    cache = SemanticCache(embeddings)
+
+    vectors = await cache.embed_many(texts)
+
+    assert vectors.shape == (5, 2)
+    # The first question goes out alone, the rest wait and share one call
+    assert embeddings.calls == [texts[:1], texts[1:]]
+    np.testing.assert_allclose(vectors[2], unit(3, 1), rtol=1e-6)
+
+
+def test_save_and_load_keep_entries(tmp_path):
+    path = tmp_path / "semantic_cache.pkl"
+    cache = SemanticCache(embeddings=None, threshold=0.9, model_name="model-a")
+    cache.add(unit(1, 0, 0), "question", "answer", context="ctx")
+    cache.save(path)
+
+    restored = SemanticCache(embeddings=None, threshold=0.9, model_name="model-a")
+    assert restored.load(path) == 1
+    assert restored.lookup(unit(1, 0, 0), "ctx") == "answer"
+
+    # Vectors from another model are not comparable
+    other_model = SemanticCache(embeddings=None, threshold=0.9, model_name="model-b")
+    assert other_model.load(path) == 0
@@ -0,0 +1,152 @@
+"""
+Unit tests for the rolling-window conversation memory
+"""
+
+import pytest
+
+from auq_nlp.agents import session_memory
+from auq_nlp.agents.session_memory import SessionMemory
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """Count one token per word, so budgets don't depend on a tokenizer download"""
+    monkeypatch.setattr(session_memory, "count_tokens", lambda text: len(text.split()))
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """Replace the summary model, recording the messages each call folds in"""
+    calls = []
+
+    async def generate_summary(self, summary, lines):
+        calls.append((summary, list(lines)))
+        return f"S{len(calls)}"
+
+    monkeypatch.setattr(SessionMemory, "_generate_summary", generate_summary)
+    return calls
+
+
+def history(*exchanges):
+    return [{"question": question, "answer": answer} for question, answer in exchanges]
+
+
+def test_normalize_history_accepts_both_formats():
+    lines = SessionMemory.normalize_history([
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello"},
+        {"question": "Population?", "answer": "1.6M"},
+        "not a message"
+    ])
+
+    assert lines == ["User: Hi", "Assistant: Hello", "User: Population?", "Assistant: 1.6M"]
+
+
+def test_window_keeps_recent_messages():
+    memory = SessionMemory(recent_messages=2, recent_token_budget=100)
+    lines = ["User: a", "Assistant: b", "User: c", "Assistant: d"]
+
+    assert memory._window_start(lines) == 2
+
+
+def test_window_respects_token_budget():
+    memory = SessionMemory(recent_messages=4, recent_token_budget=5)
+    lines = ["User: a", "Assistant: b", "User: c", "Assistant: a much longer answer"]
+
+    # The last message alone takes 5 tokens, the one before would exceed the budget
+    assert memory._window_start(lines) == 3
+
+
+async def test_short_history_is_kept_verbatim(summaries):
+    memory = SessionMemory(recent_messages=2)
+
+    context = await memory.build_context(history(("Population?", "1.6M")))
+
+    assert context == "Recent:\nUser: Population?\nAssistant: 1.6M"
+    assert summaries == []
+
+
+async def test_older_messages_are_summarized(summaries):
+    memory = SessionMemory(recent_messages=2)
+
+    context = await memory.build_context(history(("q1", "a1"), ("q2", "a2")))
+
+    assert context == "Summary so far: S1\nRecent:\nUser: q2\nAssistant: a2"
+    assert summaries == [("", ["User: q1", "Assistant: a1"])]
+
+
+async def test_summaries_extend_the_cached_prefix(summaries):
+    memory = SessionMemory(recent_messages=2)
+    await memory.build_context(history(("q1", "a1"), ("q2", "a2")))
+
+    context = await memory.build_context(history(("q1", "a1"), ("q2", "a2"), ("q3", "a3")))
+
+    # Only the messages after the summarized prefix are sent
+    assert summaries[1] == ("S1", ["User: q2", "Assistant: a2"])
+    assert context == "Summary so far: S2\nRecent:\nUser: q3\nAssistant: a3"
+
+
+async def test_session_folds_old_exchanges_on_read(summaries):
+    memory = SessionMemory(recent_messages=2)
+    memory.add_exchange("session", "q1", "a1")
+    memory.add_exchange("session", "q2", "a2")
+
+    context = await memory.build_context(session_id="session")
+
+    assert summaries == [("", ["User: q1", "Assistant: a1"])]
+    assert context == "Summary so far: S1\nRecent:\nUser: q2\nAssistant: a2"
+    # Nothing new to fold on the next read
+    assert await memory.build_context(session_id="session") == context
+    assert len(summaries) == 1
+
+
+async def test_session_context_is_reused_until_an_exchange_is_added(summaries):
+    memory = SessionMemory(recent_messages=2)
+    memory.add_exchange("session", "q1", "a1")
+
+    context = await memory.build_context(session_id="session")
+
+    assert context == "Recent:\nUser: q1\nAssistant: a1"
+    assert memory._sessions["session"]["context"] is context
+
+    memory.add_exchange("session", "q2", "a2")
+    assert memory._sessions["session"]["context"] is None
+    assert await memory.build_context(session_id="session") == "Summary so far: S1\nRecent:\nUser: q2\nAssistant: a2"
+
+
+async def test_opened_session_is_summarized_on_first_read(summaries):
+    memory = SessionMemory(recent_messages=2)
+    memory.open_session("session", history(("q1", "a1"), ("q2", "a2")))
+
+    # The key needs no summary
+    assert memory.history_key(session_id="session") == "User: q1\nAssistant: a1\nUser: q2\nAssistant: a2"
+    assert summaries == []
+
+    context = await memory.build_context(session_id="session")
+
+    assert summaries == [("", ["User: q1", "Assistant: a1"])]
+    assert context == "Summary so far: S1\nRecent:\nUser: q2\nAssistant: a2"
+
+
+async def test_failed_summary_keeps_pending_messages(monkeypatch):
+    async def fail(self, summary, lines):
+        raise RuntimeError("summary model unavailable")
+
+    monkeypatch.setattr(SessionMemory, "_generate_summary", fail)
+    memory = SessionMemory(recent_messages=2)
+    memory.add_exchange("session", "q1", "a1")
+    memory.add_exchange("session", "q2", "a2")
+
+    context = await memory.build_context(session_id="session")
+
+    assert context == "Recent:\nUser: q2\nAssistant: a2"
+    assert memory._sessions["session"]["pending"] == ["User: q1", "Assistant: a1"]
+
+
+def test_sessions_are_evicted_in_lru_order():
+    memory = SessionMemory(max_sessions=2)
+    memory.add_exchange("a", "q", "a")
+    memory.add_exchange("b", "q", "a")
+    memory.add_exchange("c", "q", "a")
+
+    assert list(memory._sessions) == ["b", "c"]
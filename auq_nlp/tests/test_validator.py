@@ -0,0 +1,129 @@
+"""
+Unit tests for the query result validator
+"""
+
+import pytest
+
+from auq_nlp.core import validator as validator_module
+from auq_nlp.core.validator import ResultValidator
+
+
+@pytest.fixture
+def validator():
+    return ResultValidator()
+
+
+def population_rows():
+    """Rows exercising every population check, repeated past the NumPy threshold"""
+    rows = [
+        ("Eixample", 266_477),
+        ("Gràcia", 121_347.0),
+        ("gràcia", 40_000),           # Known district, too small
+        ("Atlantis", 100_000),        # Unknown district
+        ("Sant Martí", -5),           # Negative
+        ("Unknown", -1.5),            # Negative and unknown
+        ("Les Corts", "n/a"),         # Not a number
+        ("Nou Barris", None),
+        ("Sants-Montjuïc", True),
+        ("Ciutat Vella", 500_000),    # Too large
+        ("Horta-Guinardó",),          # Too short to check
+        (None, 100_000),
+    ]
+    return rows * 8
+
+
+@pytest.mark.parametrize("geo_level", [None, 1, 2, 3, 9])
+def test_population_checks_match_row_loop(validator, monkeypatch, geo_level):
+    rows = population_rows()
+    assert len(rows) > validator_module._VECTORIZE_MIN_ROWS
+
+    vectorized = validator.validate_population_data(rows, geo_level=geo_level)
+    monkeypatch.setattr(validator_module, "_VECTORIZE_MIN_ROWS", len(rows))
+    looped = validator.validate_population_data(rows, geo_level=geo_level)
+
+    assert vectorized == looped
+
+
+def test_population_checks_flag_districts(validator):
+    result = validator.validate_population_data(population_rows()[:12], geo_level=2)
+
+    assert result["is_valid"] is False
+    assert "Negative population for Sant Martí: -5" in result["errors"]
+    assert "Unknown district name: Atlantis" in result["warnings"]
+    assert "Population 40,000 for gràcia seems unusual (expected range: 50,000-400,000)" in result["warnings"]
+    assert not any("Eixample" in message for message in result["warnings"])
+
+
+def test_known_districts_ignore_case(validator):
+    assert validator._is_known_district("SANT ANDREU")
+    assert not validator._is_known_district("Sant Andreu del Palomar")
+    assert not validator._is_known_district(None)
+
+
+@pytest.fixture(params=["rapidfuzz", "difflib"])
+def fuzzy_matching(request, monkeypatch):
+    """Run the suggestion tests with rapidfuzz, when installed, and with the difflib fallback"""
+    if request.param == "rapidfuzz" and validator_module.process is None:
+        pytest.skip("rapidfuzz is not installed")
+    if request.param == "difflib":
+        monkeypatch.setattr(validator_module, "process", None)
+    return request.param
+
+
+def test_similar_names_suggest_misspelled_district(validator, fuzzy_matching):
+    suggestions = validator._find_similar_names("Eixampel", validator._DISTRICTS_BY_CASEFOLD)
+
+    assert suggestions[0] == "Eixample"
+    assert len(suggestions) <= 3
+
+
+def test_similar_names_ignore_case(validator, fuzzy_matching):
+    suggestions = validator._find_similar_names("NOU BARRIS", validator._DISTRICTS_BY_CASEFOLD)
+
+    assert suggestions[0] == "Nou Barris"
+
+
+def test_similar_names_skip_unrelated_names(validator, fuzzy_matching):
+    assert validator._find_similar_names("Zzzzqx", validator._DISTRICTS_BY_CASEFOLD) == []
+
+
+def test_geographic_entity_suggests_districts(validator):
+    result = validator.validate_geographic_entity("Gracia", geo_level=2)
+
+    assert result["warnings"] == ["'Gracia' is not a known Barcelona district"]
+    assert "Gràcia" in result["suggestions"]
+
+
+def test_geographic_entity_normalizes_saint_abbreviation(validator):
+    result = validator.validate_geographic_entity("St.  Andreu", geo_level=3)
+
+    assert result["cleaned_name"] == "Sant Andreu"
+
+
+@pytest.mark.parametrize("result, warnings", [
+    (25, ["Unusually high hospital count: 25"]),
+    ([(25,)], ["Unusually high hospital count: 25"]),
+    ([[25, "extra"]], ["Unusually high hospital count: 25"]),
+    ([25], ["Unusually high hospital count: 25"]),
+    ([], []),
+    ("25", []),
+])
+def test_count_is_extracted_from_each_result_shape(validator, result, warnings):
+    validation = validator.validate_count_result(result, feature_type="hospital")
+
+    assert validation["is_valid"] is True
+    assert validation["warnings"] == warnings
+
+
+def test_count_flags_negative_and_high_counts(validator):
+    assert validator.validate_count_result(-1)["errors"] == ["Negative count: -1"]
+    assert validator.validate_count_result([(150,)], feature_type="school")["warnings"] == [
+        "Unusually high school count: 150"
+    ]
+
+
+def test_sql_query_rejects_writes(validator):
+    validation = validator.validate_sql_query("DELETE FROM districts")
+
+    assert validation["is_valid"] is False
+    assert validation["errors"] == ["Dangerous SQL operation detected: delete"]
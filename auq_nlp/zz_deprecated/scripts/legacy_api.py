@@ -11,6 +11,7 @@ License: MIT License
 """
 
 import os
+import re
 import sys
 import warnings
 import time
@@ -41,6 +42,9 @@ from result_validator import result_validator
 # Ignore LangChain internal deprecation warnings
 warnings.filterwarnings("ignore", category=LangChainDeprecationWarning)
 
+# Population figures quoted in answers, compiled once
+_POP_NUM_RE = re.compile(r'\d{1,3}(?:,\d{3})*')
+
 # Configuration
 BASE_DIR = Path(__file__).resolve().parents[0]
 PROMPT_PATH = BASE_DIR / "prompt" / "enhanced_prompt.txt"  # Use enhanced prompt
@@ -274,10 +278,10 @@ async def ask_question(request: QuestionRequest):
         validation_warnings = []
         try:
             # Basic validation for common data types
-            if "population" in request.question.lower():
+            question_lower = request.question.lower()
+            if "population" in question_lower:
                 # Try to extract numbers for validation
-                import re
-                numbers = re.findall(r'\d{1,3}(?:,\d{3})*', answer)
+                numbers = _POP_NUM_RE.findall(answer)
                 if numbers:
                     for num_str in numbers:
                         num = int(num_str.replace(',', ''))